@@ -77,6 +77,14 @@ const CreateAgentPage = () => {
       features: ['Self-evaluation', 'Iterative refinement', 'Quality scoring'],
       recommended: false
     },
+    {
+      id: 'self-rag-parallel',
+      name: 'Self-RAG (Parallel)',
+      icon: '🧠',
+      description: 'Best-of-N Self-RAG with concurrent candidate answers',
+      features: ['Query variants', 'Parallel candidates', 'Single-pass scoring'],
+      recommended: false
+    },
     {
       id: 'agentic-rag',
       name: 'Agentic RAG',
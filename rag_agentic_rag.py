@@ -0,0 +1,770 @@
+"""
+Agentic RAG Implementation
+Model acts as an agent, planning and executing multi-step tasks using retrieved knowledge,
+with integration to external tools and function calling.
+Plan steps declare their dependencies and independent steps run concurrently.
+In "tools" mode the model calls the tools natively (in parallel) and answers in the same conversation.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Callable
+from dotenv import load_dotenv
+import openai
+import requests
+from datetime import datetime
+from rag_cache import PersistentCache, normalize_query
+from rag_calculator import CalculationError, evaluate
+
+load_dotenv()
+
+# Placeholder in step parameters for the output of an earlier step, e.g. "{{step_1}}"
+STEP_REFERENCE = re.compile(r"\{\{step_(\d+)\}\}")
+
+# Seconds a successful tool result is reused; tools not listed are never cached
+TOOL_CACHE_TTLS = {
+    "knowledge_retrieval": 15 * 60,   # The index is rebuilt (and this instance dropped) on upload
+    "web_search": 5 * 60,
+    "calculate": 24 * 3600,
+    "summarize_text": 24 * 3600,
+}
+
+# Tool result fields that only describe the call and carry nothing the model needs
+RESULT_METADATA_KEYS = {"success", "source", "note", "cached"}
+
+# Longest text value of a serialized tool result passed back to the model
+MAX_RESULT_VALUE_CHARS = 4000
+
+def serialize_tool_result(result: Dict[str, Any]) -> str:
+    """Compact JSON of a tool result without metadata fields, long values truncated"""
+    compact = {}
+    for key, value in result.items():
+        if key in RESULT_METADATA_KEYS and result.get("success", True):
+            continue
+        if isinstance(value, str) and len(value) > MAX_RESULT_VALUE_CHARS:
+            value = value[:MAX_RESULT_VALUE_CHARS] + "..."
+        compact[key] = value
+    return json.dumps(compact, separators=(",", ":"), ensure_ascii=False, default=str)
+
+class AgenticRAG:
+    def __init__(self, index, max_steps: int = 5, similarity_top_k: int = 5,
+                 max_parallel_steps: int = 4, step_timeout: float = 20.0, mode: str = "plan",
+                 tool_cache_size: int = 1000):
+        self.logger = logging.getLogger(__name__)
+        self.max_steps = max_steps
+        self.mode = mode  # "plan" (plan, execute, synthesize) or "tools" (native tool-calling loop)
+        # Per-instance (so per-agent) memo of tool results, shared across steps and queries
+        self.tool_cache = PersistentCache(max_entries=tool_cache_size)
+        self._tool_cache_stats: Dict[str, Dict[str, int]] = {}
+        self._tool_cache_lock = threading.Lock()
+        self._inflight_tools: Dict[str, Future] = {}  # Identical concurrent calls share one execution
+        self.max_parallel_steps = max_parallel_steps
+        self.step_timeout = step_timeout
+        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.retriever = index.as_retriever(similarity_top_k=similarity_top_k)
+        self.tools = self._setup_tools()
+    
+    def _setup_tools(self) -> Dict[str, Dict[str, Any]]:
+        """Setup available tools for the agent"""
+        return {
+            "knowledge_retrieval": {
+                "description": "Retrieve relevant information from the knowledge base",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "The search query for knowledge retrieval"
+                        }
+                    },
+                    "required": ["query"]
+                },
+                "function": self._tool_knowledge_retrieval
+            },
+            "web_search": {
+                "description": "Search the web for current information",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "The search query for web search"
+                        }
+                    },
+                    "required": ["query"]
+                },
+                "function": self._tool_web_search
+            },
+            "calculate": {
+                "description": "Perform mathematical calculations. Supports + - * / // % **, "
+                               "abs, round, min, max, sum, mean, median, std, pow, sqrt, exp, log, "
+                               "log10, log2, sin, cos, tan, floor, ceil and the constants pi, e, tau. "
+                               "Lists of numbers are computed element-wise.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "expression": {
+                            "type": "string",
+                            "description": "Mathematical expression to calculate, e.g. 'mean(x) * 1.2'"
+                        },
+                        "variables": {
+                            "type": "object",
+                            "description": "Optional named numbers or lists of numbers used in the expression"
+                        }
+                    },
+                    "required": ["expression"]
+                },
+                "function": self._tool_calculate
+            },
+            "get_current_time": {
+                "description": "Get the current date and time",
+                "parameters": {
+                    "type": "object",
+                    "properties": {},
+                    "required": []
+                },
+                "function": self._tool_get_current_time
+            },
+            "summarize_text": {
+                "description": "Summarize long pieces of text",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "text": {
+                            "type": "string",
+                            "description": "Text to summarize"
+                        },
+                        "max_length": {
+                            "type": "integer",
+                            "description": "Maximum length of summary in words"
+                        }
+                    },
+                    "required": ["text"]
+                },
+                "function": self._tool_summarize_text
+            }
+        }
+    
+    def _tool_knowledge_retrieval(self, query: str) -> Dict[str, Any]:
+        """Retrieve information from the knowledge base"""
+        try:
+            retrieved_nodes = self.retriever.retrieve(query)
+            context = "\n\n".join([node.text for node in retrieved_nodes])
+            
+            return {
+                "success": True,
+                "content": context,
+                "source": "knowledge_base",
+                "chunks_retrieved": len(retrieved_nodes)
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "content": "Failed to retrieve from knowledge base"
+            }
+    
+    def _tool_web_search(self, query: str) -> Dict[str, Any]:
+        """Simulate web search (in a real implementation, you'd use an actual search API)"""
+        # This is a mock implementation - replace with actual web search API
+        return {
+            "success": True,
+            "content": f"Mock web search results for: {query}. In a real implementation, this would fetch current web results.",
+            "source": "web_search",
+            "note": "This is a mock implementation. Integrate with actual web search API."
+        }
+    
+    def _tool_calculate(self, expression: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Perform mathematical calculations"""
+        try:
+            # Parsed and compiled against a whitelist (no eval), with size and time limits
+            result = evaluate(expression, variables)
+            
+            return {
+                "success": True,
+                "result": result,
+                "expression": expression,
+                "source": "calculator"
+            }
+        except CalculationError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "content": f"Failed to calculate: {expression}"
+            }
+    
+    def _tool_get_current_time(self) -> Dict[str, Any]:
+        """Get current date and time"""
+        try:
+            now = datetime.now()
+            return {
+                "success": True,
+                "current_time": now.isoformat(),
+                "formatted_time": now.strftime("%Y-%m-%d %H:%M:%S"),
+                "source": "system_time"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _tool_summarize_text(self, text: str, max_length: int = 100) -> Dict[str, Any]:
+        """Summarize text using AI"""
+        try:
+            prompt = f"""
+            Summarize the following text in approximately {max_length} words:
+            
+            {text}
+            
+            Summary:
+            """
+            
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=max_length * 2
+            )
+            
+            summary = response.choices[0].message.content.strip()
+            
+            return {
+                "success": True,
+                "summary": summary,
+                "original_length": len(text.split()),
+                "summary_length": len(summary.split()),
+                "source": "ai_summarizer"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "content": "Failed to summarize text"
+            }
+    
+    def _create_plan(self, query: str) -> List[Dict[str, Any]]:
+        """Create an execution plan for the query"""
+        planning_prompt = f"""
+        You are an AI planning agent. Given a user query, create a step-by-step plan to answer it.
+        
+        Available tools:
+        - knowledge_retrieval: Search internal knowledge base
+        - web_search: Search the web for current information
+        - calculate: Perform mathematical calculations
+        - get_current_time: Get current date/time
+        - summarize_text: Summarize long text
+        
+        User Query: {query}
+        
+        Create a plan as a JSON array where each step has:
+        - step_number: integer
+        - action: tool name to use
+        - description: what this step accomplishes
+        - parameters: parameters for the tool
+        - reasoning: why this step is needed
+        - depends_on: step_numbers of earlier steps whose output this step needs ([] if none)
+        
+        Steps without dependencies run in parallel, so only add a dependency when a step really
+        needs an earlier result. A parameter can include an earlier step's output as "{{{{step_N}}}}".
+        
+        Return only the JSON array, no other text.
+        """
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": planning_prompt}],
+                temperature=0.1
+            )
+            
+            plan_json = response.choices[0].message.content.strip()
+            plan = json.loads(plan_json)
+            
+            return plan
+            
+        except Exception as e:
+            self.logger.error(f"Error creating plan: {e}")
+            # Fallback plan
+            return [
+                {
+                    "step_number": 1,
+                    "action": "knowledge_retrieval",
+                    "description": "Search knowledge base for relevant information",
+                    "parameters": {"query": query},
+                    "reasoning": "Start with internal knowledge base search",
+                    "depends_on": []
+                }
+            ]
+    
+    @staticmethod
+    def _result_text(result: Dict[str, Any]) -> str:
+        """Main textual output of a tool result"""
+        for key in ("content", "summary", "result", "formatted_time"):
+            if key in result:
+                return str(result[key])
+        return json.dumps(result)
+    
+    def _resolve_parameters(self, parameters: Dict[str, Any], outputs: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """Substitute {{step_N}} references with the output of step N"""
+        def substitute(match):
+            output = outputs.get(int(match.group(1)))
+            return self._result_text(output) if output is not None else match.group(0)
+        
+        return {
+            name: STEP_REFERENCE.sub(substitute, value) if isinstance(value, str) else value
+            for name, value in parameters.items()
+        }
+    
+    def _plan_dependencies(self, plan: List[Dict[str, Any]]) -> Dict[int, List[int]]:
+        """Dependencies per step index; only references to earlier steps are kept, so the graph is acyclic"""
+        position = {}
+        for index, step in enumerate(plan):
+            position.setdefault(step.get("step_number", index + 1), index)
+        
+        dependencies = {}
+        for index, step in enumerate(plan):
+            declared = list(step.get("depends_on") or [])
+            # Parameter references imply a dependency even if the planner did not declare it
+            for value in step.get("parameters", {}).values():
+                if isinstance(value, str):
+                    declared.extend(int(number) for number in STEP_REFERENCE.findall(value))
+            valid = []
+            for number in declared:
+                dependency = position.get(number) if isinstance(number, int) else None
+                if dependency is None or dependency >= index:
+                    self.logger.warning(f"Ignoring invalid dependency {number} of step {step.get('step_number')}")
+                elif dependency not in valid:
+                    valid.append(dependency)
+            dependencies[index] = valid
+        return dependencies
+    
+    @staticmethod
+    def _tool_cache_key(tool_name: str, parameters: Dict[str, Any]) -> str:
+        normalized = {
+            name: (normalize_query(value) if name == "query" else " ".join(value.split()))
+            if isinstance(value, str) else value
+            for name, value in parameters.items()
+        }
+        fingerprint = json.dumps([tool_name, normalized], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    
+    def _record_tool_cache(self, tool_name: str, hit: bool):
+        with self._tool_cache_lock:
+            stats = self._tool_cache_stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+    
+    def tool_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit and miss counts per cached tool"""
+        with self._tool_cache_lock:
+            return {
+                name: dict(stats, hit_rate=round(stats["hits"] / max(1, stats["hits"] + stats["misses"]), 3))
+                for name, stats in self._tool_cache_stats.items()
+            }
+    
+    def _call_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a tool, serving repeated calls from the tool cache within the tool's TTL"""
+        function = self.tools[tool_name]['function']
+        ttl = TOOL_CACHE_TTLS.get(tool_name)
+        if not ttl:
+            return function(**parameters)
+        
+        key = self._tool_cache_key(tool_name, parameters)
+        cached = self.tool_cache.get(key)
+        if cached is not None:
+            self._record_tool_cache(tool_name, True)
+            return dict(cached, cached=True)
+        
+        with self._tool_cache_lock:
+            inflight = self._inflight_tools.get(key)
+            if inflight is None:
+                owner = self._inflight_tools[key] = Future()
+        if inflight is not None:
+            self._record_tool_cache(tool_name, True)
+            return dict(inflight.result(), cached=True)
+        
+        self._record_tool_cache(tool_name, False)
+        try:
+            result = function(**parameters)
+            if result.get("success", True):
+                try:
+                    self.tool_cache.set(key, result, ttl=ttl)
+                except (TypeError, ValueError) as e:
+                    self.logger.debug(f"Not caching {tool_name} result: {e}")
+            owner.set_result(result)
+        except Exception as e:
+            owner.set_exception(e)
+            raise
+        finally:
+            with self._tool_cache_lock:
+                self._inflight_tools.pop(key, None)
+        return result
+    
+    def _run_step(self, step: Dict[str, Any], parameters: Dict[str, Any]) -> Dict[str, Any]:
+        self.logger.info(f"Executing step {step.get('step_number')}: {step.get('description')}")
+        tool_name = step.get('action')
+        if tool_name not in self.tools:
+            self.logger.warning(f"Unknown tool: {tool_name}")
+            return {"success": False, "error": f"Unknown tool: {tool_name}"}
+        return self._call_tool(tool_name, parameters)
+    
+    def _execute_plan(self, plan: List[Dict[str, Any]], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Execute the plan as a dependency graph.
+        
+        Steps start as soon as the steps they depend on have succeeded, at most max_parallel_steps
+        at a time. A step running longer than step_timeout, or still pending at the deadline, fails;
+        so do the steps depending on it.
+        """
+        dependencies = self._plan_dependencies(plan)
+        results: Dict[int, Dict[str, Any]] = {}
+        outputs: Dict[int, Dict[str, Any]] = {}  # Successful results by step_number, for references
+        pending = list(range(len(plan)))
+        running = {}  # future -> (step index, start time)
+        
+        def finish(index: int, result: Dict[str, Any], status: str, started: Optional[float] = None):
+            success = status == "completed" and result.get('success', True)
+            results[index] = {
+                "step": plan[index],
+                "result": result,
+                "success": success,
+                "status": status,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 1) if started else 0.0
+            }
+            if success:
+                outputs[plan[index].get("step_number", index + 1)] = result
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel_steps, thread_name_prefix="agentic-step")
+        try:
+            while pending or running:
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.logger.info(f"Latency budget exhausted, abandoning {len(pending) + len(running)} steps")
+                    for index, started in running.values():
+                        finish(index, {"success": False, "error": "Latency budget exhausted"}, "timeout", started)
+                    for index in pending:
+                        finish(index, {"success": False, "error": "Latency budget exhausted"}, "skipped")
+                    break
+                
+                # Fail steps whose dependencies failed, start those whose dependencies succeeded
+                for index in list(pending):
+                    if any(dependency in results and not results[dependency]["success"]
+                           for dependency in dependencies[index]):
+                        pending.remove(index)
+                        finish(index, {"success": False, "error": "A step this step depends on failed"}, "skipped")
+                    elif len(running) < self.max_parallel_steps and all(
+                            dependency in results for dependency in dependencies[index]):
+                        pending.remove(index)
+                        parameters = self._resolve_parameters(plan[index].get('parameters', {}), outputs)
+                        future = executor.submit(self._run_step, plan[index], parameters)
+                        running[future] = (index, time.monotonic())
+                
+                if not running:
+                    continue
+                
+                # Wake up on the first completion, step timeout or the deadline
+                now = time.monotonic()
+                wake_at = min(started + self.step_timeout for _, started in running.values())
+                if deadline is not None:
+                    wake_at = min(wake_at, deadline)
+                done, _ = wait(list(running), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    index, started = running.pop(future)
+                    try:
+                        finish(index, future.result(), "completed", started)
+                    except Exception as e:
+                        self.logger.error(f"Error executing step {plan[index].get('step_number')}: {e}")
+                        finish(index, {"success": False, "error": str(e)}, "failed", started)
+                
+                now = time.monotonic()
+                for future, (index, started) in list(running.items()):
+                    if now - started >= self.step_timeout:
+                        # The tool call cannot be interrupted; its result is discarded
+                        self.logger.warning(f"Step {plan[index].get('step_number')} exceeded {self.step_timeout}s timeout")
+                        running.pop(future)
+                        finish(index, {"success": False, "error": "Step timed out"}, "timeout", started)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return [results[index] for index in range(len(plan)) if index in results]
+    
+    def _synthesize_response(self, query: str, plan: List[Dict], execution_results: List[Dict]) -> str:
+        """Synthesize final response from execution results"""
+        
+        # Compile all the information gathered
+        gathered_info = []
+        for result in execution_results:
+            if result['success'] and result['result'].get('success'):
+                step_info = {
+                    "step": result['step']['description'],
+                    "data": result['result']
+                }
+                gathered_info.append(step_info)
+        gathered_lines = "\n".join(f"- {info['step']}: {serialize_tool_result(info['data'])}" for info in gathered_info)
+        
+        synthesis_prompt = f"""
+        You are an AI assistant tasked with providing a comprehensive answer based on the information gathered through multiple steps.
+        
+        Original Query: {query}
+        
+        Information Gathered:
+        {gathered_lines}
+        
+        Instructions:
+        1. Synthesize all the gathered information into a coherent, comprehensive response
+        2. Cite sources when appropriate (knowledge_base, web_search, etc.)
+        3. If calculations were performed, include the results
+        4. If information is missing or incomplete, acknowledge this
+        5. Provide a well-structured, helpful answer
+        
+        Response:
+        """
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": synthesis_prompt}],
+                temperature=0.3
+            )
+            
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            self.logger.error(f"Error synthesizing response: {e}")
+            return "I gathered some information but encountered an error while synthesizing the final response."
+    
+    def _tool_definitions(self) -> List[Dict[str, Any]]:
+        """OpenAI function-calling schemas for self.tools"""
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "description": tool["description"],
+                    "parameters": tool["parameters"]
+                }
+            }
+            for name, tool in self.tools.items()
+        ]
+    
+    def _complete(self, messages: List[Dict[str, Any]], tool_choice: str = "auto") -> Dict[str, Any]:
+        """One chat completion with the tool definitions, as its content and tool calls"""
+        response = self.openai_client.chat.completions.create(
+            model="gpt-4",
+            messages=messages,
+            tools=self._tool_definitions(),
+            tool_choice=tool_choice,
+            temperature=0.3
+        )
+        
+        message = response.choices[0].message
+        return {
+            "content": message.content or "",
+            "tool_calls": [
+                {
+                    "id": call.id,
+                    "type": "function",
+                    "function": {"name": call.function.name, "arguments": call.function.arguments or ""}
+                }
+                for call in message.tool_calls or []
+            ]
+        }
+    
+    def _execute_tool_calls(self, tool_calls: List[Dict[str, Any]], first_step: int,
+                            deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run one round of tool calls concurrently; results are in call order"""
+        steps = []
+        for offset, call in enumerate(tool_calls):
+            name = call["function"]["name"]
+            try:
+                parameters = json.loads(call["function"]["arguments"] or "{}")
+            except json.JSONDecodeError as e:
+                parameters = None
+                self.logger.warning(f"Invalid arguments for tool call {name}: {e}")
+            steps.append({
+                "step_number": first_step + offset,
+                "action": name,
+                "description": f"{name}({call['function']['arguments']})",
+                "parameters": parameters
+            })
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel_steps, thread_name_prefix="agentic-tool")
+        started = time.monotonic()
+        futures = {
+            index: executor.submit(self._run_step, step, step["parameters"])
+            for index, step in enumerate(steps) if step["parameters"] is not None
+        }
+        timeout = self.step_timeout
+        if deadline is not None:
+            timeout = min(timeout, max(0.0, deadline - started))
+        wait(list(futures.values()), timeout=timeout)
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        results = []
+        for index, step in enumerate(steps):
+            future = futures.get(index)
+            if future is None:
+                result, status = {"success": False, "error": "Arguments are not valid JSON"}, "failed"
+            elif not future.done():
+                result, status = {"success": False, "error": "Step timed out"}, "timeout"
+            else:
+                try:
+                    result, status = future.result(), "completed"
+                except Exception as e:
+                    self.logger.error(f"Error executing tool {step['action']}: {e}")
+                    result, status = {"success": False, "error": str(e)}, "failed"
+            results.append({
+                "step": step,
+                "result": result,
+                "success": status == "completed" and result.get("success", True),
+                "status": status,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+            })
+        return results
+    
+    def _tool_calling_query(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Let the model call tools natively, in parallel, and answer in the same conversation"""
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an AI assistant that answers questions using the available tools. "
+                           "Search the internal knowledge base for anything about the user's documents. "
+                           "Call independent tools in parallel. Cite sources (knowledge_base, web_search, etc.) "
+                           "and acknowledge missing information."
+            },
+            {"role": "user", "content": question}
+        ]
+        execution_results = []
+        final_response = ""
+        
+        for round_number in range(1, self.max_steps + 1):
+            # On the last round, or once the deadline has passed, the model must answer
+            out_of_time = deadline is not None and time.monotonic() >= deadline
+            tool_choice = "none" if round_number == self.max_steps or out_of_time else "auto"
+            try:
+                completion = self._complete(messages, tool_choice)
+            except Exception as e:
+                self.logger.error(f"Error in tool-calling round {round_number}: {e}")
+                final_response = "I gathered some information but encountered an error while generating the response."
+                break
+            
+            if not completion["tool_calls"]:
+                final_response = completion["content"]
+                break
+            
+            self.logger.info(f"Round {round_number}: model requested {len(completion['tool_calls'])} tool calls")
+            round_results = self._execute_tool_calls(completion["tool_calls"], len(execution_results) + 1, deadline)
+            execution_results.extend(round_results)
+            
+            messages.append({
+                "role": "assistant",
+                "content": completion["content"] or None,
+                "tool_calls": completion["tool_calls"]
+            })
+            for call, result in zip(completion["tool_calls"], round_results):
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": call["id"],
+                    "content": serialize_tool_result(result["result"])
+                })
+        
+        return {
+            "query": question,
+            "mode": "tools",
+            "plan": [result["step"] for result in execution_results],
+            "execution_results": execution_results,
+            "final_response": final_response,
+            "total_steps": len(execution_results),
+            "successful_steps": sum(1 for r in execution_results if r['success']),
+            "tool_cache": self.tool_cache_stats()
+        }
+    
+    def query(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Main query method that implements agentic planning and execution
+        
+        Args:
+            question: The user's question
+            deadline: Optional time.monotonic() value after which unfinished plan steps are abandoned
+        """
+        if self.mode == "tools":
+            self.logger.info(f"Starting tool-calling Agentic RAG query: {question}")
+            return self._tool_calling_query(question, deadline)
+        
+        self.logger.info(f"Starting Agentic RAG query: {question}")
+        
+        # Create execution plan, capped at the configured step limit
+        plan = self._create_plan(question)
+        if len(plan) > self.max_steps:
+            self.logger.info(f"Truncating plan from {len(plan)} to {self.max_steps} steps")
+            plan = plan[:self.max_steps]
+        self.logger.info(f"Created plan with {len(plan)} steps")
+        
+        # Execute the plan
+        execution_results = self._execute_plan(plan, deadline)
+        
+        # Synthesize final response
+        final_response = self._synthesize_response(question, plan, execution_results)
+        
+        return {
+            "query": question,
+            "mode": "plan",
+            "plan": plan,
+            "execution_results": execution_results,
+            "final_response": final_response,
+            "total_steps": len(plan),
+            "successful_steps": sum(1 for r in execution_results if r['success']),
+            "tool_cache": self.tool_cache_stats()
+        }
+
+def run_agentic_rag_query(query: str, index) -> Dict[str, Any]:
+    """
+    Run an Agentic RAG query
+    
+    Args:
+        query: The user's question
+        index: Vector index holding the agent's documents
+    
+    Returns:
+        Dictionary containing the plan, execution results, and final response
+    """
+    try:
+        agentic_rag = AgenticRAG(index)
+        result = agentic_rag.query(query)
+        return result
+        
+    except Exception as e:
+        logging.error(f"Error in Agentic RAG query: {e}")
+        return {
+            "error": str(e),
+            "final_response": "I apologize, but I encountered an error while processing your query."
+        }
+
+if __name__ == "__main__":
+    # Test the Agentic RAG implementation
+    logging.basicConfig(level=logging.INFO)
+    
+    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+    
+    index = VectorStoreIndex.from_documents(SimpleDirectoryReader('data').load_data())
+    
+    test_query = "What's the current market value of AI companies and how does it relate to the information in our knowledge base about AI adoption?"
+    result = run_agentic_rag_query(test_query, index)
+    
+    print("=== Agentic RAG Results ===")
+    print(f"Query: {result['query']}")
+    print(f"Total Steps: {result['total_steps']}")
+    print(f"Successful Steps: {result['successful_steps']}")
+    
+    print("\n=== Execution Plan ===")
+    for step in result.get('plan', []):
+        print(f"Step {step['step_number']}: {step['description']}")
+        print(f"  Tool: {step['action']}")
+        print(f"  Reasoning: {step['reasoning']}")
+    
+    print(f"\n=== Final Response ===")
+    print(result['final_response'])
@@ -5,26 +5,43 @@ Enhanced with proper RAG functionality and robust error handling
 
 import os
 import json
+import time
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
 # Try to import RAG components with fallback
 try:
-    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings
+    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings, StorageContext
+    from llama_index.core.schema import MetadataMode
     from llama_index.vector_stores.pinecone import PineconeVectorStore
     from llama_index.llms.openai import OpenAI
-    from llama_index.embeddings.openai import OpenAIEmbedding
     from pinecone import Pinecone, ServerlessSpec
+    from rag_embeddings import (
+        EmbeddingConfig, default_embedding_config, embedding_config, embedding_cost, embedding_dimension,
+        get_embed_model, get_query_embeddings
+    )
+    from rag_file_router import ROUTING_MIN_FILES, SUMMARY_STORE_DIR, build_file_summaries
+    from rag_multi_agent import FUSED_TOP_K, MAX_AGENTS, multi_agent_query
     RAG_AVAILABLE = True
     print("✅ RAG components loaded successfully")
 except ImportError as e:
     print(f"⚠️ RAG components not available: {e}")
     RAG_AVAILABLE = False
 
+from rag_strategies import StrategyEngine
+from rag_reranker import reranker_stats
+from rag_inference import loaded_models
+from rag_context import count_tokens
+from rag_query_config import QueryConfig, llm_cache_size, query_config
+
 # Load environment variables
 load_dotenv()
 
@@ -34,6 +51,25 @@ try:
 except ImportError:
     MODEL_NAME = "gpt-4o"
 
+# Optional database access for agent configuration (agents / agent_settings tables)
+try:
+    from sqlalchemy import create_engine, text
+    DATABASE_URL = os.getenv("DATABASE_URL")
+    db_engine = create_engine(DATABASE_URL) if DATABASE_URL else None
+except ImportError:
+    db_engine = None
+
+# Seconds an agent's database configuration is cached before it is re-read
+AGENT_CONFIG_TTL = 60
+
+# /query/batch limits: questions per request and queries in flight per request
+BATCH_MAX_QUERIES = 1000
+BATCH_DEFAULT_CONCURRENCY = 4
+BATCH_MAX_CONCURRENCY = 4
+# Batch queries in flight across all batches; kept below the strategy engine's workers
+# (8 per pool) so live /query/ requests never queue behind a batch and burn their budget
+BATCH_ENGINE_SLOTS = 4
+
 app = FastAPI(title="Enhanced Working RAG Backend", version="2.0.0")
 
 app.add_middleware(
@@ -46,8 +82,20 @@ app.add_middleware(
 
 # Global variables for RAG components
 agent_indexes: Dict[str, VectorStoreIndex] = {}
+agent_documents: Dict[str, List[Any]] = {}
+agent_configs: Dict[str, Dict[str, Any]] = {}
+ingestion_metrics: Dict[str, Dict[str, Any]] = {}
+strategy_engine = StrategyEngine()
+batch_slots = threading.BoundedSemaphore(BATCH_ENGINE_SLOTS)
 pinecone_client = None
 pinecone_index = None
+pinecone_indexes: Dict[int, Any] = {}
+pinecone_indexes_lock = threading.Lock()
+# Embedding configuration (EmbeddingConfig.key) each cached agent index was built with
+agent_index_embeddings: Dict[str, str] = {}
+# One index build at a time per agent; concurrent callers wait and reuse the result
+agent_index_locks: Dict[str, threading.Lock] = {}
+agent_index_locks_lock = threading.Lock()
 
 def initialize_rag_components():
     """Initialize RAG components if available"""
@@ -65,25 +113,14 @@ def initialize_rag_components():
             print("⚠️ API keys not configured properly")
             return False
         
-        # Configure LlamaIndex settings
+        # Configure LlamaIndex settings (agents may override the embedding model)
         Settings.llm = OpenAI(model=MODEL_NAME, api_key=openai_api_key)
-        Settings.embed_model = OpenAIEmbedding(api_key=openai_api_key)
+        default_config = default_embedding_config()
+        Settings.embed_model = get_embed_model(default_config)
         
-        # Initialize Pinecone
+        # Initialize Pinecone with the index for the default embedding dimension
         pinecone_client = Pinecone(api_key=pinecone_api_key)
-        index_name = os.getenv("PINECONE_INDEX_NAME", "llamaindex-demo")
-        
-        # Create index if it doesn't exist
-        existing_indexes = pinecone_client.list_indexes().names()
-        if index_name not in existing_indexes:
-            pinecone_client.create_index(
-                name=index_name,
-                dimension=1536,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1")
-            )
-        
-        pinecone_index = pinecone_client.Index(index_name)
+        pinecone_index = get_pinecone_index(embedding_dimension(default_config))
         print("✅ RAG components initialized successfully")
         return True
         
@@ -91,6 +128,36 @@ def initialize_rag_components():
         print(f"❌ Failed to initialize RAG components: {e}")
         return False
 
+def get_pinecone_index(dimension: int):
+    """Pinecone index for vectors of the given dimension, created if it doesn't exist
+    
+    The configured index is used when its dimension matches; other dimensions get
+    their own index named <PINECONE_INDEX_NAME>-<dimension>.
+    """
+    # Agents built concurrently (/query/multi) must not both create the same index
+    with pinecone_indexes_lock:
+        if dimension not in pinecone_indexes:
+            pinecone_indexes[dimension] = _open_pinecone_index(dimension)
+        return pinecone_indexes[dimension]
+
+def _open_pinecone_index(dimension: int):
+    base_name = os.getenv("PINECONE_INDEX_NAME", "llamaindex-demo")
+    existing = {description.name: description.dimension for description in pinecone_client.list_indexes()}
+    index_name = base_name if existing.get(base_name, dimension) == dimension else f"{base_name}-{dimension}"
+    
+    if index_name not in existing:
+        print(f"📐 Creating Pinecone index {index_name} with dimension {dimension}")
+        pinecone_client.create_index(
+            name=index_name,
+            dimension=dimension,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+    elif existing[index_name] != dimension:
+        raise ValueError(f"Pinecone index {index_name} has dimension {existing[index_name]}, expected {dimension}")
+    
+    return pinecone_client.Index(index_name)
+
 # Initialize RAG on startup
 rag_initialized = initialize_rag_components()
 
@@ -121,11 +188,27 @@ def create_agent_index(agent_id: str) -> Optional[VectorStoreIndex]:
         return None
         
     cache_key = f"agent_{agent_id}"
+    # A cached index is only valid for the embedding model it was built with
+    config = embedding_config(get_agent_config(agent_id)["settings"])
     
     # Return cached index if available
-    if cache_key in agent_indexes:
+    if cache_key in agent_indexes and agent_index_embeddings.get(cache_key) == config.key:
         return agent_indexes[cache_key]
     
+    with agent_index_locks_lock:
+        lock = agent_index_locks.setdefault(agent_id, threading.Lock())
+    with lock:
+        if cache_key in agent_indexes:
+            if agent_index_embeddings.get(cache_key) == config.key:
+                return agent_indexes[cache_key]
+            print(f"🔁 Embedding model for agent {agent_id} changed to {config.key}, rebuilding index")
+            invalidate_agent_index(agent_id)
+        return build_agent_index(agent_id, config)
+
+def build_agent_index(agent_id: str, config: EmbeddingConfig) -> Optional[VectorStoreIndex]:
+    """Load, embed and index an agent's files with the given embedding configuration"""
+    cache_key = f"agent_{agent_id}"
+    
     try:
         agent_dir = get_agent_data_directory(agent_id)
         files = get_agent_files(agent_id)
@@ -134,6 +217,8 @@ def create_agent_index(agent_id: str) -> Optional[VectorStoreIndex]:
             print(f"⚠️ No files found for agent {agent_id}")
             return None
         
+        ingest_start = time.monotonic()
+        
         # Load documents
         documents = SimpleDirectoryReader(str(agent_dir)).load_data()
         
@@ -141,20 +226,78 @@ def create_agent_index(agent_id: str) -> Optional[VectorStoreIndex]:
             print(f"⚠️ No documents loaded for agent {agent_id}")
             return None
         
-        # Create agent-specific vector store
+        # Embedding model from agent_settings (OpenAI unless embedding_provider is "local")
+        embed_model = get_embed_model(config)
+        dimension = embedding_dimension(config)
+        
+        # Chunk and embed in batches here so embedding time and tokens can be measured
+        nodes = Settings.node_parser.get_nodes_from_documents(documents)
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embed_start = time.monotonic()
+        embeddings = embed_model.get_text_embedding_batch(texts)
+        embedding_seconds = time.monotonic() - embed_start
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        
+        # Create agent-specific vector store in the index matching the model's dimension.
+        # Non-default models get their own namespace so vectors of different models never mix.
+        namespace = f"agent_{agent_id}" if config.is_default else \
+            f"agent_{agent_id}__{config.model.replace('/', '--')}"
+        vector_index = get_pinecone_index(dimension)
+        try:
+            # The namespace is rebuilt from the current files
+            vector_index.delete(delete_all=True, namespace=namespace)
+        except Exception:
+            pass  # Namespace does not exist yet
         vector_store = PineconeVectorStore(
-            pinecone_index=pinecone_index,
-            namespace=f"agent_{agent_id}"
+            pinecone_index=vector_index,
+            namespace=namespace
         )
         
-        # Create index
-        index = VectorStoreIndex.from_documents(
-            documents,
-            vector_store=vector_store
+        # Create index (nodes are already embedded, queries use the same model)
+        upsert_start = time.monotonic()
+        index = VectorStoreIndex(
+            nodes,
+            storage_context=StorageContext.from_defaults(vector_store=vector_store),
+            embed_model=embed_model
         )
         
+        tokens = sum(count_tokens(text) for text in texts)
+        ingestion_metrics[agent_id] = {
+            "documents": len(documents),
+            "chunks": len(nodes),
+            "embedding_provider": config.provider,
+            "embedding_model": config.model,
+            "dimension": dimension,
+            "namespace": namespace,
+            "embedding_tokens": tokens,
+            "embedding_seconds": round(embedding_seconds, 3),
+            "chunks_per_second": round(len(nodes) / embedding_seconds, 1) if embedding_seconds > 0 else None,
+            "embedding_cost_usd": round(embedding_cost(config, tokens), 6),
+            "upsert_seconds": round(time.monotonic() - upsert_start, 3),
+            "ingested_at": time.time()
+        }
+        
+        # Summary layer for two-stage retrieval (file routing, then chunk search in those files)
+        summary_path = SUMMARY_STORE_DIR / f"{agent_id}.json"
+        if len(files) >= ROUTING_MIN_FILES:
+            try:
+                ingestion_metrics[agent_id]["file_summaries"] = build_file_summaries(
+                    documents, embed_model, str(summary_path)
+                )
+            except Exception as e:
+                print(f"⚠️ Could not build file summaries for agent {agent_id}: {e}")
+        else:
+            summary_path.unlink(missing_ok=True)  # Too few files left to route
+        ingestion_metrics[agent_id]["total_seconds"] = round(time.monotonic() - ingest_start, 3)
+        
         agent_indexes[cache_key] = index
-        print(f"✅ Created index for agent {agent_id} with {len(files)} files: {files}")
+        agent_documents[cache_key] = documents
+        agent_index_embeddings[cache_key] = config.key
+        # Strategies with ingestion-time work (Graph RAG extraction) start it now, not on the first query
+        strategy_engine.prepare(agent_id, get_agent_config(agent_id).get("rag_architecture"), index, documents)
+        print(f"✅ Created index for agent {agent_id} with {len(files)} files: {files} "
+              f"({len(nodes)} chunks embedded with {config.key} in {embedding_seconds:.1f}s)")
         return index
         
     except Exception as e:
@@ -162,6 +305,55 @@ def create_agent_index(agent_id: str) -> Optional[VectorStoreIndex]:
         traceback.print_exc()
         return None
 
+def invalidate_agent_index(agent_id: str) -> bool:
+    """Drop the cached index, documents and strategy instances for an agent"""
+    cache_key = f"agent_{agent_id}"
+    agent_documents.pop(cache_key, None)
+    agent_index_embeddings.pop(cache_key, None)
+    agent_configs.pop(agent_id, None)
+    strategy_engine.invalidate(agent_id)
+    return agent_indexes.pop(cache_key, None) is not None
+
+def get_agent_config(agent_id: str) -> Dict[str, Any]:
+    """Load an agent's rag_architecture and agent_settings from the database (cached)"""
+    cached = agent_configs.get(agent_id)
+    if cached and time.monotonic() - cached["loaded_at"] < AGENT_CONFIG_TTL:
+        return cached
+    
+    config = {"rag_architecture": None, "settings": {}, "loaded_at": time.monotonic()}
+    if db_engine is None:
+        return config
+    
+    try:
+        with db_engine.connect() as connection:
+            if agent_id.isdigit():
+                row = connection.execute(text(
+                    "SELECT id, rag_architecture FROM agents WHERE id = :agent_id"
+                ), {"agent_id": int(agent_id)}).fetchone()
+            else:
+                row = connection.execute(text(
+                    "SELECT id, rag_architecture FROM agents WHERE name = :name"
+                ), {"name": agent_id}).fetchone()
+            
+            if row:
+                config["rag_architecture"] = row.rag_architecture
+                settings = connection.execute(text(
+                    "SELECT setting_key, setting_value FROM agent_settings WHERE agent_id = :agent_id"
+                ), {"agent_id": row.id})
+                for setting in settings:
+                    value = setting.setting_value
+                    if isinstance(value, str):
+                        try:
+                            value = json.loads(value)
+                        except json.JSONDecodeError:
+                            pass
+                    config["settings"][setting.setting_key] = value
+    except Exception as e:
+        print(f"⚠️ Could not load configuration for agent {agent_id}: {e}")
+    
+    agent_configs[agent_id] = config
+    return config
+
 def provide_basic_document_content(agent_id: str, query: str, files: List[str]) -> Dict[str, Any]:
     """Provide basic document content reading when RAG is not available"""
     try:
@@ -225,8 +417,16 @@ Note: This is a basic content view due to API quota limitations. For enhanced AI
             "error": str(e)
         }
 
-def query_agent_documents(agent_id: str, query: str) -> Dict[str, Any]:
-    """Query agent documents with enhanced error handling"""
+def query_agent_documents(agent_id: str, query: str, rag_architecture: Optional[str] = None,
+                          config: Optional[QueryConfig] = None,
+                          query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    """Query agent documents with enhanced error handling
+    
+    The query runs through the strategy engine using rag_architecture when given,
+    otherwise the architecture stored for the agent in the database. config carries
+    per-request generation and retrieval parameters; query_embedding, when given, is
+    the query already embedded with the agent's model.
+    """
     files = []  # Initialize files as empty list
     
     try:
@@ -251,24 +451,33 @@ def query_agent_documents(agent_id: str, query: str) -> Dict[str, Any]:
             
             if index:
                 try:
-                    query_engine = index.as_query_engine()
+                    architecture = rag_architecture or get_agent_config(agent_id).get("rag_architecture")
                     
-                    # Enhanced query with safety checks
-                    result = query_engine.query(query)
+                    # Dispatch to the agent's RAG strategy over the shared index
+                    result = strategy_engine.run(
+                        agent_id, architecture, query, index,
+                        agent_documents.get(f"agent_{agent_id}"),
+                        query_config=config,
+                        query_embedding=query_embedding
+                    )
+                    response_text = result["response"]
                     
-                    # Check if result is valid
-                    if result and hasattr(result, 'response') and result.response:
-                        response_text = str(result.response)
-                        
-                        # Check for empty or generic responses
-                        if len(response_text.strip()) > 10 and "I don't have information" not in response_text:
-                            return {
-                                "response": response_text,
-                                "status": "rag_success",
-                                "files": files,
-                                "rag_used": True,
-                                "source_nodes": len(result.source_nodes) if hasattr(result, 'source_nodes') and result.source_nodes else 0
+                    # Check for empty or generic responses
+                    if len(response_text.strip()) > 10 and "I don't have information" not in response_text:
+                        return {
+                            "response": response_text,
+                            "status": "rag_success",
+                            "files": files,
+                            "rag_used": True,
+                            "source_nodes": result["source_nodes"],
+                            "strategy": {
+                                "architecture": result["architecture"],
+                                "requested_architecture": result["requested_architecture"],
+                                "downgrade_reason": result.get("downgrade_reason"),
+                                "elapsed_ms": result["elapsed_ms"],
+                                "query_config_applied": result["query_config_applied"]
                             }
+                        }
                     
                 except Exception as e:
                     print(f"❌ RAG query failed for agent {agent_id}: {e}")
@@ -320,7 +529,7 @@ async def root():
         "version": "2.0.0",
         "rag_available": RAG_AVAILABLE,
         "rag_initialized": rag_initialized,
-        "endpoints": ["/health", "/query", "/agents", "/agent-files/{agent_id}", "/process-agent-file"]
+        "endpoints": ["/health", "/query", "/query/batch", "/query/multi", "/agents", "/agent-files/{agent_id}", "/process-agent-file", "/strategy-metrics", "/ingestion-metrics"]
     }
 
 @app.get("/agents")
@@ -467,14 +676,20 @@ async def query_endpoint(request: Request):
         data = await request.json()
         query = data.get("query", "")
         agent_id = str(data.get("agent_id", "unknown"))
+        rag_architecture = data.get("rag_architecture")
         
         print(f"📝 Query received for agent {agent_id}: '{query[:100]}...'")
         
         if not query.strip():
             raise HTTPException(status_code=400, detail="Empty query provided")
         
-        # Query agent documents with enhanced RAG
-        result = query_agent_documents(agent_id, query)
+        # Generation/retrieval parameters from the request, defaulting to the agent's settings
+        agent_config = await run_in_threadpool(get_agent_config, agent_id)
+        config = query_config(data, agent_config["settings"])
+        
+        # Query agent documents with enhanced RAG; index builds and strategies block,
+        # so keep them off the event loop
+        result = await run_in_threadpool(query_agent_documents, agent_id, query, rag_architecture, config)
         
         # Prepare final response
         response = {
@@ -484,7 +699,8 @@ async def query_endpoint(request: Request):
             "files_available": len(result["files"]),
             "files": result["files"],
             "status": result["status"],
-            "model": data.get("model", MODEL_NAME),
+            "model": config.model or MODEL_NAME,
+            "query_config": config.to_dict(),
             "rag_used": result["rag_used"],
             "enhanced_mode": True
         }
@@ -492,6 +708,8 @@ async def query_endpoint(request: Request):
         # Add additional metadata if available
         if "source_nodes" in result:
             response["source_nodes"] = result["source_nodes"]
+        if "strategy" in result:
+            response["strategy"] = result["strategy"]
         if "error" in result:
             response["error"] = result["error"]
         
@@ -508,6 +726,158 @@ async def query_endpoint(request: Request):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Query processing error: {str(e)}")
 
+def stream_batch_results(agent_id: str, queries: List[Dict[str, Any]], rag_architecture: Optional[str],
+                         config: QueryConfig, concurrency: int):
+    """Run a batch of queries for one agent, yielding one JSON line per result as each completes"""
+    batch_start = time.monotonic()
+    
+    # Embed every question up front on the query path; strategies that can reuse the vector skip their own call
+    embeddings: List[Optional[List[float]]] = [None] * len(queries)
+    index = create_agent_index(agent_id) if rag_initialized else None
+    if index is not None:
+        embed_model = getattr(index, "_embed_model", None) or Settings.embed_model
+        try:
+            embeddings = list(get_query_embeddings(embed_model, [item["query"] for item in queries]))
+        except Exception as e:
+            print(f"⚠️ Batch embedding failed for agent {agent_id}, embedding per query: {e}")
+    
+    def run_query(position: int) -> Dict[str, Any]:
+        item = queries[position]
+        with batch_slots:
+            query_start = time.monotonic()
+            result = query_agent_documents(agent_id, item["query"], rag_architecture, config, embeddings[position])
+        line = {
+            "index": position,
+            "id": item.get("id"),
+            "query": item["query"],
+            "response": result["response"],
+            "status": result["status"],
+            "rag_used": result["rag_used"],
+            "elapsed_ms": round((time.monotonic() - query_start) * 1000, 1)
+        }
+        for key in ("source_nodes", "strategy", "error"):
+            if key in result:
+                line[key] = result[key]
+        return line
+    
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="query-batch")
+    futures = {executor.submit(run_query, position): position for position in range(len(queries))}
+    errors = 0
+    try:
+        for future in as_completed(futures):
+            position = futures[future]
+            try:
+                line = future.result()
+            except Exception as e:
+                line = {"index": position, "id": queries[position].get("id"), "query": queries[position]["query"],
+                        "status": "error", "rag_used": False, "error": str(e)}
+            if line["status"] == "error":
+                errors += 1
+            yield json.dumps(line) + "\n"
+        yield json.dumps({
+            "done": True,
+            "agent_id": agent_id,
+            "count": len(queries),
+            "errors": errors,
+            "elapsed_ms": round((time.monotonic() - batch_start) * 1000, 1)
+        }) + "\n"
+    finally:
+        # Client went away or the batch finished: drop queries that have not started
+        executor.shutdown(wait=False, cancel_futures=True)
+
+@app.post("/query/batch")
+async def query_batch_endpoint(request: Request):
+    """Run many queries against one agent, streaming results back as JSON lines
+    
+    Body: {"agent_id", "queries": [str | {"id", "query"}], optional "rag_architecture",
+    "concurrency" and the generation parameters accepted by /query/}. Each line is one
+    result in completion order (with its "index" in the request); the last line has "done".
+    """
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in request body")
+    
+    agent_id = str(data.get("agent_id", "unknown"))
+    raw_queries = data.get("queries")
+    if not isinstance(raw_queries, list) or not raw_queries:
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list")
+    if len(raw_queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    
+    queries = []
+    for position, item in enumerate(raw_queries):
+        item = {"query": item} if isinstance(item, str) else item
+        if not isinstance(item, dict) or not str(item.get("query", "")).strip():
+            raise HTTPException(status_code=400, detail=f"Query {position} is empty")
+        queries.append({"id": item.get("id"), "query": str(item["query"])})
+    
+    try:
+        concurrency = int(data.get("concurrency") or BATCH_DEFAULT_CONCURRENCY)
+    except (TypeError, ValueError):
+        concurrency = BATCH_DEFAULT_CONCURRENCY
+    concurrency = min(max(concurrency, 1), BATCH_MAX_CONCURRENCY)
+    
+    agent_config = await run_in_threadpool(get_agent_config, agent_id)
+    config = query_config(data, agent_config["settings"])
+    print(f"📦 Batch of {len(queries)} queries for agent {agent_id} (concurrency {concurrency})")
+    return StreamingResponse(
+        stream_batch_results(agent_id, queries, data.get("rag_architecture"), config, concurrency),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/query/multi")
+async def query_multi_agent_endpoint(request: Request):
+    """Answer one query from several agents' documents
+    
+    Body: {"query", "agent_ids": [...], optional generation parameters as for /query/}.
+    Retrieval runs across the agents' namespaces concurrently; the chunks are fused into
+    one ranking and synthesized with a single LLM call.
+    """
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON in request body")
+    
+    query = str(data.get("query", ""))
+    agent_ids = data.get("agent_ids")
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="Empty query provided")
+    if not isinstance(agent_ids, list) or not agent_ids:
+        raise HTTPException(status_code=400, detail="agent_ids must be a non-empty list")
+    if not rag_initialized:
+        raise HTTPException(status_code=503, detail="RAG components are not initialized")
+    agent_ids = [str(agent_id) for agent_id in agent_ids]
+    if len(set(agent_ids)) > MAX_AGENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_AGENTS} agents per query")
+    
+    # Generation parameters come from the request only; the agents' own settings may disagree
+    config = query_config(data)
+    print(f"🔀 Multi-agent query across {agent_ids}: '{query[:100]}...'")
+    
+    try:
+        # The fan-out blocks on retrievals, so keep it off the event loop
+        result = await run_in_threadpool(
+            multi_agent_query, query, agent_ids, create_agent_index,
+            query_config=config, top_k=config.similarity_top_k or FUSED_TOP_K
+        )
+    except Exception as e:
+        print(f"❌ Multi-agent query failed: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Query processing error: {str(e)}")
+    
+    return {
+        "response": result["final_response"],
+        "agent_ids": agent_ids,
+        "sources": result["sources"],
+        "agents": result["agents"],
+        "model": config.model or MODEL_NAME,
+        "query_config": config.to_dict(),
+        "retrieval_ms": result["retrieval_ms"],
+        "synthesis_ms": result["synthesis_ms"],
+        "rag_used": bool(result["sources"])
+    }
+
 @app.get("/agent-files/{agent_id}")
 async def get_agent_files_endpoint(agent_id: str):
     """Get files for a specific agent with enhanced error handling"""
@@ -549,9 +919,7 @@ async def process_agent_file(request: Request):
             raise HTTPException(status_code=400, detail="agent_id is required")
         
         # Clear cached index for this agent to force rebuild
-        cache_key = f"agent_{agent_id}"
-        if cache_key in agent_indexes:
-            del agent_indexes[cache_key]
+        if invalidate_agent_index(str(agent_id)):
             print(f"🔄 Cleared cached index for agent {agent_id}")
         
         # Get updated file list
@@ -584,9 +952,7 @@ async def upload_file(agent_id: str, file: UploadFile = File(...)):
             buffer.write(content)
         
         # Clear cached index to force rebuild
-        cache_key = f"agent_{agent_id}"
-        if cache_key in agent_indexes:
-            del agent_indexes[cache_key]
+        invalidate_agent_index(agent_id)
         
         print(f"📁 Uploaded {file.filename} for agent {agent_id}")
         
@@ -650,10 +1016,7 @@ async def get_frontend_compatible_files(agent_id: str):
 @app.delete("/agent-index/{agent_id}")
 async def clear_agent_index(agent_id: str):
     """Clear cached index for an agent"""
-    cache_key = f"agent_{agent_id}"
-    
-    if cache_key in agent_indexes:
-        del agent_indexes[cache_key]
+    if invalidate_agent_index(agent_id):
         return {
             "status": "cleared",
             "agent_id": agent_id,
@@ -666,6 +1029,22 @@ async def clear_agent_index(agent_id: str):
             "message": f"No cached index found for agent {agent_id}"
         }
 
+@app.get("/strategy-metrics")
+async def strategy_metrics():
+    """Per-strategy call counts, timeouts, downgrades and latency percentiles"""
+    return {
+        "strategies": strategy_engine.metrics.snapshot(),
+        "cached_instances": strategy_engine.instance_count(),
+        "rerankers": reranker_stats(),
+        "local_models": loaded_models(),
+        "cached_llm_clients": llm_cache_size()
+    }
+
+@app.get("/ingestion-metrics")
+async def get_ingestion_metrics():
+    """Per-agent chunk counts, embedding model, embedding time/tokens/cost of the last index build"""
+    return {"agents": ingestion_metrics}
+
 @app.get("/system-status")
 async def system_status():
     """Detailed system status"""
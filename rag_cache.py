@@ -0,0 +1,228 @@
+"""
+Persistent cache shared by the RAG strategies
+SQLite-backed key/value store with per-entry TTL, LRU eviction and an optional
+nearest-vector lookup for semantic matching. Values are stored as JSON.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(text: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a query"""
+    return re.sub(r"\s+", " ", text.strip().lower()).rstrip("?!. ")
+
+class _VectorIndex:
+    """L2-normalized vectors of one namespace held in memory for nearest() lookups
+
+    Rows are updated in place; removed or expired entries are masked by their expiry
+    time and dropped when the index is compacted.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 64):
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.matrix = np.zeros((capacity, dimension), dtype=np.float32)
+        self.expires = np.zeros(capacity, dtype=np.float64)
+
+    def put(self, key: str, vector: np.ndarray, expires_at: float):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+                self.expires = np.concatenate([self.expires, np.zeros_like(self.expires)])
+            self.keys.append(key)
+            self.rows[key] = row
+        norm = np.linalg.norm(vector)
+        self.matrix[row] = vector / norm if norm > 0 else vector
+        self.expires[row] = expires_at
+
+    def remove(self, key: str):
+        row = self.rows.get(key)
+        if row is not None:
+            self.expires[row] = 0.0
+
+    def nearest(self, query: np.ndarray, now: float) -> Optional[Tuple[str, float]]:
+        size = len(self.keys)
+        if size == 0:
+            return None
+        live = self.expires[:size] > now
+        if size > 64 and 2 * int(live.sum()) < size:
+            self._compact(live)
+            return self.nearest(query, now)
+        similarities = self.matrix[:size] @ query
+        similarities[~live] = -np.inf
+        best = int(np.argmax(similarities))
+        if not np.isfinite(similarities[best]):
+            return None
+        return self.keys[best], float(similarities[best])
+
+    def _compact(self, live: np.ndarray):
+        rows = np.flatnonzero(live)
+        self.keys = [self.keys[row] for row in rows]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        capacity = max(64, 2 * len(rows))
+        matrix = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+        matrix[:len(rows)] = self.matrix[rows]
+        expires = np.zeros(capacity, dtype=np.float64)
+        expires[:len(rows)] = self.expires[rows]
+        self.matrix, self.expires = matrix, expires
+
+class PersistentCache:
+    """Thread-safe TTL/LRU cache. Without a path it lives in memory for the process only."""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 5000,
+                 default_ttl: float = 7 * 24 * 3600):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path) if self.path else ":memory:", check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                vector BLOB,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_namespace ON cache (namespace)")
+        self._db.commit()
+        # (namespace, dimension) -> vectors loaded on the first nearest() and kept in sync by set()
+        self._vector_indexes: Dict[Tuple[str, int], _VectorIndex] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Live values of the given keys in one transaction; missing and expired keys are left out"""
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys, now)
+            ).fetchall()
+            if rows:
+                self._db.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                                     [(now, key) for key, _ in rows])
+                self._db.commit()
+        return {key: json.loads(value) for key, value in rows}
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None, namespace: str = ""):
+        """Store several JSON-serializable values in one transaction with a single eviction pass"""
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cache (key, namespace, value, vector, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, NULL, ?, ?)",
+                [(key, namespace, json.dumps(value), expires_at, now) for key, value in items.items()]
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, namespace: str = "",
+            vector: Optional[List[float]] = None):
+        """Store a JSON-serializable value, optionally with a vector for nearest() lookups"""
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        array = None if vector is None else np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, namespace, value, vector, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(value), None if array is None else array.tobytes(), expires_at, now)
+            )
+            if array is not None and (namespace, len(array)) in self._vector_indexes:
+                self._vector_indexes[(namespace, len(array))].put(key, array, expires_at)
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        # Expired rows are already masked in the vector indexes
+        self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self.max_entries:
+            evicted = self._db.execute(
+                "SELECT key FROM cache ORDER BY accessed_at LIMIT ?", (count - self.max_entries,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM cache WHERE key = ?", evicted)
+            for vector_index in self._vector_indexes.values():
+                for (key,) in evicted:
+                    vector_index.remove(key)
+
+    def _vector_index(self, namespace: str, dimension: int) -> _VectorIndex:
+        """The namespace's in-memory index, loaded from the database on first use (lock held)"""
+        vector_index = self._vector_indexes.get((namespace, dimension))
+        if vector_index is None:
+            vector_index = _VectorIndex(dimension)
+            rows = self._db.execute(
+                "SELECT key, vector, expires_at FROM cache "
+                "WHERE namespace = ? AND vector IS NOT NULL AND expires_at > ?",
+                (namespace, time.time())
+            ).fetchall()
+            for key, blob, expires_at in rows:
+                # Vectors of another dimension come from a different embedding model
+                if len(blob) == dimension * 4:
+                    vector_index.put(key, np.frombuffer(blob, dtype=np.float32), expires_at)
+            self._vector_indexes[(namespace, dimension)] = vector_index
+        return vector_index
+
+    def nearest(self, namespace: str, vector: List[float],
+                min_similarity: float) -> Optional[Tuple[str, Any, float]]:
+        """Live entry in the namespace whose vector is most cosine-similar, as (key, value, similarity)
+
+        Namespaces should be specific to one embedding model; vectors of another model with
+        the same dimension are not comparable.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None
+        with self._lock:
+            match = self._vector_index(namespace, len(query)).nearest(query / query_norm, time.time())
+        if match is None or match[1] < min_similarity:
+            return None
+        key, similarity = match
+        value = self.get(key)  # Also refreshes the LRU position
+        if value is None:
+            return None
+        return key, value, similarity
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM cache")
+            self._db.commit()
+            self._vector_indexes.clear()
@@ -0,0 +1,193 @@
+"""
+Safe arithmetic evaluator for the agent calculator tool
+Expressions are parsed once into a tree of closures over a small whitelist of
+operators and functions (no eval) and cached. Lists evaluate element-wise with NumPy.
+"""
+import ast
+import math
+import operator
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+MAX_EXPRESSION_LENGTH = 2000
+MAX_NODES = 500
+MAX_ELEMENTS = 100_000        # per list operand or result
+MAX_RESULT_DIGITS = 1000      # integer results (and intermediate values) beyond this are refused
+TIME_LIMIT_SECONDS = 1.0
+
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+def _round(value, digits=0):
+    rounded = np.round(value, int(digits))
+    return rounded if digits else (rounded.astype(np.int64) if isinstance(rounded, np.ndarray) else int(rounded))
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "abs": np.abs,
+    "round": _round,
+    "min": lambda *args: np.min(args[0]) if len(args) == 1 else np.min(np.stack(np.broadcast_arrays(*args)), axis=0),
+    "max": lambda *args: np.max(args[0]) if len(args) == 1 else np.max(np.stack(np.broadcast_arrays(*args)), axis=0),
+    "sum": np.sum,
+    "mean": np.mean,
+    "median": np.median,
+    "std": np.std,
+    "pow": lambda base, exponent: _power(base, exponent),
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": lambda value, base=None: np.log(value) if base is None else np.log(value) / np.log(base),
+    "log10": np.log10,
+    "log2": np.log2,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "floor": np.floor,
+    "ceil": np.ceil,
+}
+
+class CalculationError(ValueError):
+    """Raised for expressions that are invalid, unsupported or exceed the limits"""
+
+def _check_size(value):
+    # A negative base with a fractional exponent, e.g. (-8)**(1/3), yields a complex number
+    if isinstance(value, (complex, np.complexfloating)) or \
+            (isinstance(value, np.ndarray) and np.iscomplexobj(value)):
+        raise CalculationError("Result is not a real number")
+    if isinstance(value, np.ndarray) and value.size > MAX_ELEMENTS:
+        raise CalculationError(f"Operand exceeds {MAX_ELEMENTS} elements")
+    # Products of large integers grow without bound; bit_length avoids converting to decimal
+    if isinstance(value, int) and value.bit_length() * math.log10(2) > MAX_RESULT_DIGITS:
+        raise CalculationError(f"Result exceeds {MAX_RESULT_DIGITS} digits")
+    return value
+
+def _power(base, exponent):
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if exponent * math.log10(abs(base)) > MAX_RESULT_DIGITS:
+            raise CalculationError(f"Result would exceed {MAX_RESULT_DIGITS} digits")
+    return operator.pow(base, exponent)
+
+def _as_operand(value):
+    if isinstance(value, bool):
+        raise CalculationError("Booleans are not numbers")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        if len(value) > MAX_ELEMENTS:
+            raise CalculationError(f"Operand exceeds {MAX_ELEMENTS} elements")
+        try:
+            return np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise CalculationError("Lists may only contain numbers")
+    raise CalculationError(f"Unsupported value of type {type(value).__name__}")
+
+def _compile(node: ast.AST, counter: list) -> Callable[[Dict[str, Any], float], Any]:
+    """Turn a validated AST node into a closure of (variables, deadline)"""
+    counter[0] += 1
+    if counter[0] > MAX_NODES:
+        raise CalculationError(f"Expression exceeds {MAX_NODES} nodes")
+
+    if isinstance(node, ast.Constant):
+        value = _as_operand(node.value)
+        return lambda variables, deadline: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return lambda variables, deadline: value
+
+        def load(variables, deadline):
+            if name not in variables:
+                raise CalculationError(f"Unknown name: {name}")
+            return variables[name]
+        return load
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile(element, counter) for element in node.elts]
+
+        def build(variables, deadline):
+            values = [item(variables, deadline) for item in items]
+            if any(isinstance(value, np.ndarray) for value in values):
+                raise CalculationError("Nested lists are not supported")
+            return _as_operand(values)
+        return build
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        function = _power if isinstance(node.op, ast.Pow) else BINARY_OPERATORS[type(node.op)]
+        left, right = _compile(node.left, counter), _compile(node.right, counter)
+
+        def binary(variables, deadline):
+            if time.monotonic() > deadline:
+                raise CalculationError(f"Calculation exceeded {TIME_LIMIT_SECONDS}s")
+            return _check_size(function(left(variables, deadline), right(variables, deadline)))
+        return binary
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        function = UNARY_OPERATORS[type(node.op)]
+        operand = _compile(node.operand, counter)
+        return lambda variables, deadline: function(operand(variables, deadline))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+            and not node.keywords:
+        function = FUNCTIONS[node.func.id]
+        arguments = [_compile(argument, counter) for argument in node.args]
+
+        def call(variables, deadline):
+            if time.monotonic() > deadline:
+                raise CalculationError(f"Calculation exceeded {TIME_LIMIT_SECONDS}s")
+            return _check_size(function(*[argument(variables, deadline) for argument in arguments]))
+        return call
+
+    raise CalculationError(f"Unsupported syntax: {type(node).__name__}")
+
+@lru_cache(maxsize=512)
+def compile_expression(expression: str) -> Callable[[Dict[str, Any], float], Any]:
+    """Parse and validate an expression once; repeated expressions reuse the compiled form"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculationError(f"Expression exceeds {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise CalculationError(f"Invalid expression: {e.msg}")
+    return _compile(tree.body, [0])
+
+def _to_python(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def evaluate(expression: str, variables: Optional[Dict[str, Any]] = None) -> Any:
+    """Evaluate an arithmetic expression; list variables and literals evaluate element-wise"""
+    operands = {name: _check_size(_as_operand(value)) for name, value in (variables or {}).items()}
+    with np.errstate(all="ignore"):
+        try:
+            result = _check_size(compile_expression(expression)(operands, time.monotonic() + TIME_LIMIT_SECONDS))
+        except CalculationError:
+            raise
+        except ZeroDivisionError:
+            raise CalculationError("Division by zero")
+        except Exception as e:
+            # NumPy and the whitelisted functions raise their own errors (e.g. min([]))
+            raise CalculationError(str(e) or type(e).__name__)
+    # Integers are exact (and may exceed float range), only floats can overflow to inf/nan
+    if isinstance(result, (float, np.floating, np.ndarray)) and not np.all(np.isfinite(result)):
+        raise CalculationError("Result is not a finite number")
+    return _to_python(result)
@@ -0,0 +1,88 @@
+"""
+Context assembly shared by the RAG strategies
+Tracks retrieved chunks by node ID across retrieval rounds and packs the best of them
+into a prompt context under a token budget.
+"""
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Rough characters-per-token ratio used when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding(name: str):
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding {name} unavailable, estimating token counts: {e}")
+        return None
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """Token count of text with a cached tokenizer, estimated from length if none is available"""
+    tokenizer = _get_encoding(encoding)
+    if tokenizer is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+class ContextAssembler:
+    """Deduplicated pool of retrieved chunks, ranked by score and packed to a token budget"""
+
+    SEPARATOR = "\n\n"
+
+    def __init__(self, token_budget: int = 2000, encoding: str = DEFAULT_ENCODING):
+        self.token_budget = token_budget
+        self.encoding = encoding
+        self._chunks: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def add(self, nodes: Iterable[Any], source: str = "") -> int:
+        """Add retrieved nodes, keeping each node ID once at its best score. Returns the number of new chunks."""
+        added = 0
+        for node in nodes:
+            node_id = getattr(node, "node_id", None) or str(hash(node.text))
+            score = getattr(node, "score", None)
+            score = float(score) if score is not None else 0.0
+            chunk = self._chunks.get(node_id)
+            if chunk is not None:
+                chunk["score"] = max(chunk["score"], score)
+                continue
+            self._chunks[node_id] = {
+                "node_id": node_id,
+                "text": node.text,
+                "score": score,
+                "source": source,
+                "order": len(self._chunks),
+                "tokens": count_tokens(node.text, self.encoding),
+            }
+            added += 1
+        return added
+
+    def ranked(self) -> List[Dict[str, Any]]:
+        """Chunks by descending score, earlier retrievals first on ties"""
+        return sorted(self._chunks.values(), key=lambda chunk: (-chunk["score"], chunk["order"]))
+
+    def select(self, token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Highest-ranked chunks that fit the token budget together"""
+        budget = self.token_budget if token_budget is None else token_budget
+        separator_tokens = count_tokens(self.SEPARATOR, self.encoding)
+        selected = []
+        used = 0
+        for chunk in self.ranked():
+            cost = chunk["tokens"] + (separator_tokens if selected else 0)
+            if used + cost > budget:
+                # Smaller chunks further down may still fit
+                continue
+            selected.append(chunk)
+            used += cost
+        return selected
+
+    def build(self, token_budget: Optional[int] = None) -> str:
+        return self.SEPARATOR.join(chunk["text"] for chunk in self.select(token_budget))
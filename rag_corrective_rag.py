@@ -2,62 +2,45 @@
 Corrective RAG (CRAG) Implementation
 Adds an error-detection module that validates the generated response against reliable sources,
 triggering a correction loop if needed.
+Independent LLM calls and retrievals within a correction iteration run concurrently.
 """
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 import openai
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from llama_index.embeddings.openai import OpenAIEmbedding
-from pinecone import Pinecone, ServerlessSpec
 import json
 import re
+from rag_context import ContextAssembler
+from rag_grounding import score_grounding
 
 load_dotenv()
 
 class CorrectiveRAG:
-    def __init__(self, data_dir: str = 'data', max_corrections: int = 3):
-        self.data_dir = data_dir
+    def __init__(self, index, max_corrections: int = 3, similarity_top_k: int = 5, max_workers: int = 8,
+                 context_token_budget: int = 1500):
+        self.logger = logging.getLogger(__name__)
         self.max_corrections = max_corrections
+        self.context_token_budget = context_token_budget  # Prompt context size, constant across rounds
         self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.retriever = self._setup_retriever()
-        self.logger = logging.getLogger(__name__)
-        
-    def _setup_retriever(self):
-        """Initialize the retrieval system"""
-        try:
-            pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-            index_name = os.getenv("PINECONE_INDEX_NAME", "crag-index")
-            
-            if index_name not in pc.list_indexes().names():
-                pc.create_index(
-                    name=index_name,
-                    dimension=1536,
-                    metric="cosine",
-                    spec=ServerlessSpec(
-                        cloud="aws",
-                        region=os.getenv("PINECONE_ENVIRONMENT", "us-east-1")
-                    )
-                )
-            
-            pinecone_index = pc.Index(index_name)
-            vector_store = PineconeVectorStore(pinecone_index=pinecone_index)
-            embed_model = OpenAIEmbedding()
-            
-            documents = SimpleDirectoryReader(self.data_dir).load_data()
-            index = VectorStoreIndex.from_documents(
-                documents, 
-                vector_store=vector_store, 
-                embed_model=embed_model
-            )
-            
-            return index.as_retriever(similarity_top_k=5)
-            
-        except Exception as e:
-            self.logger.error(f"Error setting up retriever: {e}")
-            raise
+        self.retriever = index.as_retriever(similarity_top_k=similarity_top_k)
+        # Shared by all queries on this instance for the concurrent calls inside an iteration
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crag")
+    
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """Seconds left before the deadline, or None when there is no deadline"""
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+    
+    @staticmethod
+    def _quality(iteration_record: Dict[str, Any]) -> float:
+        """Combined confidence and validation score of an evaluated response"""
+        return (float(iteration_record.get("confidence_score", 0.5)) +
+                float(iteration_record.get("validation_score", 0.5))) / 2
     
     def _generate_initial_response(self, query: str, context: str) -> str:
         """Generate the initial response using retrieved context"""
@@ -162,6 +145,21 @@ class CorrectiveRAG:
     def _validate_against_sources(self, response: str, context: str) -> Dict[str, Any]:
         """Validate response against source material"""
         
+        # Local lexical pre-check; the LLM validator only runs when it is inconclusive
+        grounding = score_grounding(response, context.split(ContextAssembler.SEPARATOR))
+        if grounding.verdict != "uncertain":
+            self.logger.info(f"Source validation decided locally: {grounding.verdict} ({grounding.score:.2f})")
+            grounded = grounding.verdict == "grounded"
+            return {
+                "supported_claims": grounding.supported,
+                "contradicted_claims": [],
+                "unsupported_claims": grounding.unsupported,
+                "validation_score": grounding.supported_fraction if grounded else grounding.score,
+                "needs_correction": not grounded,
+                "issues_found": [] if grounded else ["Most claims are not found in the source context"],
+                "method": "local"
+            }
+        
         validation_prompt = f"""
         Validate the following response against the provided source context.
         
@@ -193,6 +191,7 @@ class CorrectiveRAG:
             )
             
             validation_result = json.loads(validation_response.choices[0].message.content)
+            validation_result["method"] = "llm"
             return validation_result
             
         except Exception as e:
@@ -206,7 +205,8 @@ class CorrectiveRAG:
                 "issues_found": ["Validation system error"]
             }
     
-    def _retrieve_correction_context(self, query: str, error_analysis: Dict, current_context: str) -> str:
+    def _retrieve_correction_context(self, query: str, error_analysis: Dict, assembler: ContextAssembler,
+                                     deadline: Optional[float] = None) -> str:
         """Retrieve additional context for correction based on detected errors"""
         
         # Create targeted queries based on detected issues
@@ -223,19 +223,24 @@ class CorrectiveRAG:
         # Add original query with different phrasing
         correction_queries.append(f"comprehensive information about {query}")
         
-        # Retrieve additional context
-        additional_contexts = []
-        for correction_query in correction_queries[:3]:  # Limit to 3 additional queries
+        # Retrieve additional context, all queries at once (limit to 3 additional queries)
+        correction_queries = correction_queries[:3]
+        futures = [self._executor.submit(self.retriever.retrieve, correction_query)
+                   for correction_query in correction_queries]
+        wait(futures, timeout=self._remaining(deadline))
+        
+        for correction_query, future in zip(correction_queries, futures):
+            if not future.done():
+                self.logger.warning(f"Correction retrieval for '{correction_query}' missed the deadline")
+                continue
             try:
-                nodes = self.retriever.retrieve(correction_query)
-                additional_contexts.extend([node.text for node in nodes[:2]])
+                added = assembler.add(future.result()[:2], source=correction_query)
+                self.logger.debug(f"Correction query '{correction_query}' added {added} new chunks")
             except Exception as e:
                 self.logger.warning(f"Failed to retrieve correction context for '{correction_query}': {e}")
         
-        # Combine original and additional context, removing duplicates
-        all_context = current_context + "\n\n" + "\n\n".join(additional_contexts)
-        
-        return all_context
+        # Chunks are deduplicated by node ID; the best-ranked ones are packed to the token budget
+        return assembler.build()
     
     def _generate_corrected_response(self, query: str, original_response: str, 
                                    error_analysis: Dict, enhanced_context: str, 
@@ -257,7 +262,7 @@ class CorrectiveRAG:
         Detected Issues:
         {chr(10).join(error_summary)}
         
-        Enhanced Context: {enhanced_context[:2500]}...
+        Enhanced Context: {enhanced_context}
         
         Suggested Improvements:
         {chr(10).join(['- ' + imp for imp in error_analysis.get('suggested_improvements', [])])}
@@ -286,31 +291,50 @@ class CorrectiveRAG:
             self.logger.error(f"Error generating corrected response: {e}")
             return f"I apologize, but I encountered an error while generating the corrected response (iteration {correction_iteration})."
     
-    def query(self, question: str) -> Dict[str, Any]:
+    def query(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         Main query method that implements Corrective RAG with error detection and correction loops
+        
+        Args:
+            question: The user's question
+            deadline: Optional time.monotonic() value; once reached the best response so far is returned
         """
         self.logger.info(f"Starting Corrective RAG query: {question}")
         
         # Initial retrieval
         retrieved_nodes = self.retriever.retrieve(question)
-        initial_context = "\n\n".join([node.text for node in retrieved_nodes])
+        assembler = ContextAssembler(token_budget=self.context_token_budget)
+        assembler.add(retrieved_nodes, source=question)
+        initial_context = assembler.build()
         
         # Generate initial response
         current_response = self._generate_initial_response(question, initial_context)
         
-        # Track correction history
+        # Track correction history and the best-scoring response seen so far
         correction_history = []
         current_context = initial_context
+        best_record: Optional[Dict[str, Any]] = None
+        final_response = current_response
+        deadline_reached = False
         
         for correction_iteration in range(1, self.max_corrections + 1):
-            self.logger.info(f"Correction iteration {correction_iteration}")
+            if deadline is not None and time.monotonic() >= deadline:
+                self.logger.info(f"Latency budget exhausted before correction iteration {correction_iteration}")
+                deadline_reached = True
+                break
             
-            # Detect errors in current response
-            error_analysis = self._detect_errors(question, current_response, current_context)
+            self.logger.info(f"Correction iteration {correction_iteration}")
             
-            # Validate against sources
-            source_validation = self._validate_against_sources(current_response, current_context)
+            # Detect errors and validate against sources concurrently
+            error_future = self._executor.submit(self._detect_errors, question, current_response, current_context)
+            validation_future = self._executor.submit(self._validate_against_sources, current_response, current_context)
+            _, pending = wait([error_future, validation_future], timeout=self._remaining(deadline))
+            if pending:
+                self.logger.info(f"Latency budget exhausted while evaluating iteration {correction_iteration}")
+                deadline_reached = True
+                break
+            error_analysis = error_future.result()
+            source_validation = validation_future.result()
             
             # Record iteration
             iteration_record = {
@@ -324,6 +348,11 @@ class CorrectiveRAG:
             }
             correction_history.append(iteration_record)
             
+            # A correction is only kept if its evaluation does not score below the best so far
+            if best_record is None or self._quality(iteration_record) >= self._quality(best_record):
+                best_record = iteration_record
+            final_response = best_record["response"]
+            
             # Check if correction is needed
             if not error_analysis.get("correction_needed", True) and source_validation.get("validation_score", 0) > 0.8:
                 self.logger.info(f"Response validated after {correction_iteration} iterations")
@@ -335,28 +364,44 @@ class CorrectiveRAG:
                 break
             
             # Retrieve additional context for correction
-            enhanced_context = self._retrieve_correction_context(question, error_analysis, current_context)
+            enhanced_context = self._retrieve_correction_context(
+                question, best_record["error_analysis"], assembler, deadline
+            )
             
-            # Generate corrected response
-            current_response = self._generate_corrected_response(
-                question, current_response, error_analysis, enhanced_context, correction_iteration
+            # Generate a corrected version of the best response so far
+            correction_future = self._executor.submit(
+                self._generate_corrected_response,
+                question, best_record["response"], best_record["error_analysis"],
+                enhanced_context, correction_iteration
             )
+            done, _ = wait([correction_future], timeout=self._remaining(deadline))
+            if not done:
+                self.logger.info(f"Latency budget exhausted while correcting iteration {correction_iteration}")
+                deadline_reached = True
+                break
+            current_response = correction_future.result()
+            
+            # An unevaluated correction of the best response supersedes it if the deadline hits next
+            final_response = current_response
             
             # Update context for next iteration
             current_context = enhanced_context
         
         # Calculate final quality metrics
-        final_iteration = correction_history[-1] if correction_history else {}
+        final_iteration = best_record or {}
         final_confidence = final_iteration.get("confidence_score", 0.5)
         final_validation = final_iteration.get("validation_score", 0.5)
         
         return {
             "query": question,
-            "final_response": current_response,
+            "final_response": final_response,
             "correction_history": correction_history,
             "total_iterations": len(correction_history),
+            "best_iteration": final_iteration.get("iteration"),
+            "deadline_reached": deadline_reached,
             "initial_context_length": len(initial_context),
             "final_context_length": len(current_context),
+            "retrieved_chunks": len(assembler),
             "quality_metrics": {
                 "final_confidence_score": final_confidence,
                 "final_validation_score": final_validation,
@@ -371,20 +416,20 @@ class CorrectiveRAG:
             }
         }
 
-def run_corrective_rag_query(query: str, data_dir: str = 'data', max_corrections: int = 3) -> Dict[str, Any]:
+def run_corrective_rag_query(query: str, index, max_corrections: int = 3) -> Dict[str, Any]:
     """
     Run a Corrective RAG query
     
     Args:
         query: The user's question
-        data_dir: Directory containing documents for retrieval
+        index: Vector index holding the agent's documents
         max_corrections: Maximum number of correction iterations
     
     Returns:
         Dictionary containing correction history and final validated response
     """
     try:
-        crag = CorrectiveRAG(data_dir=data_dir, max_corrections=max_corrections)
+        crag = CorrectiveRAG(index, max_corrections=max_corrections)
         result = crag.query(query)
         return result
         
@@ -399,8 +444,12 @@ if __name__ == "__main__":
     # Test the Corrective RAG implementation
     logging.basicConfig(level=logging.INFO)
     
+    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+    
+    index = VectorStoreIndex.from_documents(SimpleDirectoryReader('data').load_data())
+    
     test_query = "What are the key differences between supervised and unsupervised machine learning, and when should each be used?"
-    result = run_corrective_rag_query(test_query, max_corrections=2)
+    result = run_corrective_rag_query(test_query, index, max_corrections=2)
     
     print("=== Corrective RAG Results ===")
     print(f"Query: {result['query']}")
@@ -0,0 +1,156 @@
+"""
+Embedding models for agent indexes
+Agents embed with OpenAI unless their agent_settings set embedding_provider to "local", in
+which case a sentence-transformers model (embedding_model) runs in batches on the CPU.
+Dimensions are looked up per model so each model family gets a vector index that fits it.
+"""
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from rag_inference import load_sentence_transformer
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("openai", "local")
+DEFAULT_MODELS = {"openai": "text-embedding-ada-002", "local": "all-MiniLM-L6-v2"}
+
+# Texts per forward pass for local models
+LOCAL_BATCH_SIZE = 64
+
+OPENAI_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+# USD per million tokens
+OPENAI_PRICES = {
+    "text-embedding-ada-002": 0.10,
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+}
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    provider: str
+    model: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    @property
+    def is_default(self) -> bool:
+        return self == default_embedding_config()
+
+def default_embedding_config() -> EmbeddingConfig:
+    return EmbeddingConfig("openai", DEFAULT_MODELS["openai"])
+
+def embedding_config(settings: Dict[str, Any]) -> EmbeddingConfig:
+    """Embedding provider and model from an agent's settings"""
+    provider = str(settings.get("embedding_provider") or "openai").strip().lower()
+    if provider not in PROVIDERS:
+        logger.warning(f"Unknown embedding provider {provider}, using openai")
+        provider = "openai"
+    model = str(settings.get("embedding_model") or DEFAULT_MODELS[provider]).strip()
+    return EmbeddingConfig(provider, model)
+
+class LocalEmbedding(BaseEmbedding):
+    """LlamaIndex embedding backed by a shared, process-wide sentence-transformers model"""
+
+    _model: Any = PrivateAttr()
+
+    def __init__(self, model_name: str = DEFAULT_MODELS["local"], embed_batch_size: int = LOCAL_BATCH_SIZE,
+                 **kwargs: Any):
+        super().__init__(model_name=model_name, embed_batch_size=embed_batch_size, **kwargs)
+        self._model = load_sentence_transformer(model_name)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalEmbedding"
+
+    @property
+    def dimension(self) -> int:
+        return int(self._model.get_sentence_embedding_dimension())
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._model.encode(texts, batch_size=self.embed_batch_size,
+                                     normalize_embeddings=True, show_progress_bar=False)
+        return [vector.tolist() for vector in vectors]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._encode([query])[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts)
+
+    def get_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        """Query-path embeddings of several queries in one forward pass"""
+        return self._encode(queries)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+_embed_models: Dict[str, BaseEmbedding] = {}
+_dimensions: Dict[str, int] = {}
+_embed_models_lock = threading.Lock()
+
+def get_embed_model(config: EmbeddingConfig) -> BaseEmbedding:
+    """Shared embedding model instance for a configuration"""
+    with _embed_models_lock:
+        if config.key not in _embed_models:
+            if config.provider == "local":
+                _embed_models[config.key] = LocalEmbedding(config.model)
+            else:
+                from llama_index.embeddings.openai import OpenAIEmbedding
+                _embed_models[config.key] = OpenAIEmbedding(model=config.model,
+                                                            api_key=os.getenv("OPENAI_API_KEY"))
+        return _embed_models[config.key]
+
+def get_query_embeddings(embed_model: BaseEmbedding, queries: List[str]) -> List[List[float]]:
+    """Query-path embeddings of several queries, batched where the model allows it
+
+    get_text_embedding_batch is the document path, which differs for models that embed
+    queries with an instruction or a separate engine.
+    """
+    if isinstance(embed_model, LocalEmbedding):
+        return embed_model.get_query_embedding_batch(queries)
+    query_engine = getattr(embed_model, "_query_engine", None)
+    if query_engine is not None and query_engine == getattr(embed_model, "_text_engine", None):
+        # OpenAI models that embed queries and documents with the same engine
+        return embed_model.get_text_embedding_batch(queries)
+    return [embed_model.get_query_embedding(query) for query in queries]
+
+def embedding_dimension(config: EmbeddingConfig) -> int:
+    """Vector size produced by the configured model"""
+    with _embed_models_lock:
+        if config.key in _dimensions:
+            return _dimensions[config.key]
+    if config.provider == "openai" and config.model in OPENAI_DIMENSIONS:
+        dimension = OPENAI_DIMENSIONS[config.model]
+    else:
+        embed_model = get_embed_model(config)
+        if isinstance(embed_model, LocalEmbedding):
+            dimension = embed_model.dimension
+        else:
+            dimension = len(embed_model.get_text_embedding("dimension probe"))
+    with _embed_models_lock:
+        _dimensions[config.key] = dimension
+    return dimension
+
+def embedding_cost(config: EmbeddingConfig, tokens: int) -> float:
+    """Estimated USD cost of embedding the given number of tokens (local models are free)"""
+    if config.provider == "local":
+        return 0.0
+    return tokens * OPENAI_PRICES.get(config.model, OPENAI_PRICES[DEFAULT_MODELS["openai"]]) / 1_000_000
@@ -0,0 +1,195 @@
+"""
+Per-file summary routing for agents with many files
+At ingestion every file gets a short summary and one embedding, stored per agent and reused
+while the file is unchanged. Queries first pick the files whose summaries are closest to the
+question, then chunk retrieval runs with a metadata filter restricted to those files.
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import openai
+from dotenv import load_dotenv
+from llama_index.core import QueryBundle, Settings
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
+
+from rag_graph_store import content_hash
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Per-agent summary files (kept outside data/agents so they are not indexed)
+SUMMARY_STORE_DIR = Path("data/summaries")
+
+# Metadata key SimpleDirectoryReader sets on every document and chunk
+FILE_KEY = "file_name"
+
+# Agents with fewer files search all chunks; routing would only add an embedding lookup
+ROUTING_MIN_FILES = 6
+DEFAULT_TOP_FILES = 3
+
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_INPUT_CHARS = 6000
+SUMMARY_WORKERS = 8
+# Used as the summary when the LLM call fails
+FALLBACK_SUMMARY_CHARS = 600
+
+FORMAT_VERSION = 1
+
+def _embed_model_name(embed_model) -> str:
+    return getattr(embed_model, "model_name", None) or type(embed_model).__name__
+
+def _group_by_file(documents: List[Any]) -> "OrderedDict[str, str]":
+    """File name -> full text (PDFs and similar load as one document per page)"""
+    files: "OrderedDict[str, List[str]]" = OrderedDict()
+    for document in documents:
+        name = (document.metadata or {}).get(FILE_KEY)
+        if name:
+            files.setdefault(name, []).append(document.text)
+    return OrderedDict((name, "\n\n".join(texts)) for name, texts in files.items())
+
+class FileSummaryStore:
+    """JSON file of {file name: hash, summary, embedding} for one agent"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            if data.get("version") == FORMAT_VERSION:
+                return data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable file summaries {self.path}: {e}")
+        return {"version": FORMAT_VERSION, "embed_model": None, "files": {}}
+
+    def save(self, data: Dict[str, Any]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix=f".{self.path.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(data, handle)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+def _summarize_file(client, name: str, text: str) -> Tuple[str, bool]:
+    """Summary of a file, and whether it came from the LLM rather than the fallback"""
+    prompt = f"""
+    Summarize the following file in 2-3 sentences for a search index. Name its subject,
+    the kind of document it is and the main topics, entities and terms it covers.
+
+    File: {name}
+
+    {text[:SUMMARY_INPUT_CHARS]}
+    """
+    try:
+        response = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=200
+        )
+        return response.choices[0].message.content.strip(), True
+    except Exception as e:
+        logger.warning(f"Error summarizing {name}, using its opening text: {e}")
+        return " ".join(text[:FALLBACK_SUMMARY_CHARS].split()), False
+
+def build_file_summaries(documents: List[Any], embed_model, path: str) -> Dict[str, Any]:
+    """Summarize and embed new or changed files, reusing stored summaries for the rest"""
+    start = time.monotonic()
+    store = FileSummaryStore(path)
+    stored = store.load()
+    embed_name = _embed_model_name(embed_model)
+    # Summaries stay valid across embedding models, their vectors do not
+    same_model = stored.get("embed_model") == embed_name
+
+    files = _group_by_file(documents)
+    entries: Dict[str, Any] = {}
+    to_summarize: List[Tuple[str, str, str]] = []
+    for name, text in files.items():
+        doc_hash = content_hash(text)
+        previous = stored["files"].get(name)
+        # Fallback summaries are retried on the next build
+        if previous and previous["hash"] == doc_hash and not previous.get("fallback"):
+            entries[name] = dict(previous)
+        else:
+            to_summarize.append((name, text, doc_hash))
+
+    if to_summarize:
+        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+            summaries = list(executor.map(lambda item: _summarize_file(client, item[0], item[1]), to_summarize))
+        for (name, _, doc_hash), (summary, generated) in zip(to_summarize, summaries):
+            entries[name] = {"hash": doc_hash, "summary": summary, "embedding": None, "fallback": not generated}
+
+    to_embed = [name for name, entry in entries.items() if entry.get("embedding") is None or not same_model]
+    if to_embed:
+        vectors = embed_model.get_text_embedding_batch(
+            [f"{name}\n{entries[name]['summary']}" for name in to_embed]
+        )
+        for name, vector in zip(to_embed, vectors):
+            entries[name]["embedding"] = list(map(float, vector))
+
+    store.save({"version": FORMAT_VERSION, "embed_model": embed_name, "files": entries})
+    stats = {
+        "files": len(entries),
+        "summarized": len(to_summarize),
+        "embedded": len(to_embed),
+        "seconds": round(time.monotonic() - start, 3)
+    }
+    logger.info(f"File summaries for {path}: {stats}")
+    return stats
+
+class FileRouter:
+    """Picks the files most relevant to a question by summary embedding similarity"""
+
+    def __init__(self, entries: Dict[str, Any], embed_model, top_files: int = DEFAULT_TOP_FILES):
+        self.embed_model = embed_model
+        self.top_files = top_files
+        self.names = list(entries)
+        self.summaries = [entries[name]["summary"] for name in self.names]
+        matrix = np.asarray([entries[name]["embedding"] for name in self.names], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+
+    @classmethod
+    def load(cls, path: str, index, top_files: int = DEFAULT_TOP_FILES,
+             min_files: int = ROUTING_MIN_FILES) -> Optional["FileRouter"]:
+        """Router over an agent's stored summaries, or None when routing does not apply"""
+        # Query vectors must come from the model the agent's index was built with
+        embed_model = getattr(index, "_embed_model", None) or Settings.embed_model
+        data = FileSummaryStore(path).load()
+        entries = {name: entry for name, entry in data["files"].items() if entry.get("embedding")}
+        if len(entries) < max(min_files, top_files + 1):
+            return None
+        if data.get("embed_model") != _embed_model_name(embed_model):
+            logger.warning(f"File summaries in {path} were embedded with another model, not routing")
+            return None
+        return cls(entries, embed_model, top_files=top_files)
+
+    def route(self, question: str, query_embedding: Optional[List[float]] = None) -> Tuple[QueryBundle, List[str]]:
+        """Query bundle carrying the question embedding (reused by chunk retrieval) and the chosen files"""
+        embedding = query_embedding if query_embedding is not None else self.embed_model.get_query_embedding(question)
+        query = np.asarray(embedding, dtype=np.float32)
+        similarities = self.matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        top = np.argsort(-similarities)[:self.top_files]
+        return QueryBundle(query_str=question, embedding=embedding), [self.names[i] for i in top]
+
+    @staticmethod
+    def filters(files: List[str]) -> MetadataFilters:
+        return MetadataFilters(filters=[MetadataFilter(key=FILE_KEY, value=files, operator=FilterOperator.IN)])
@@ -0,0 +1,668 @@
+"""
+Graph RAG Implementation
+Uses graph databases to model relationships between documents/concepts.
+Retrieval considers both semantic similarity and graph structure.
+Global questions are answered by map-reduce over precomputed community summaries.
+"""
+import os
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+import openai
+import numpy as np
+import json
+import re
+from rag_concurrency import RateLimiter
+from rag_graph_store import (
+    CompactGraph, GraphStore, TextStore, build_compact_graph, community_key, content_hash,
+    detect_communities
+)
+from rag_inference import load_sentence_transformer
+
+load_dotenv()
+
+# Broad questions about the whole corpus rather than specific entities
+GLOBAL_QUESTION_PATTERN = re.compile(
+    r"\b(main|key|major|common|overall|recurring)\s+(themes?|topics?|ideas?|trends?|points?)\b"
+    r"|\bacross\s+(all|the|our)\s+(documents|files|corpus|collection)\b"
+    r"|\b(summari[sz]e|overview of)\s+(everything|all|the\s+(documents|corpus|collection))\b",
+    re.IGNORECASE
+)
+
+class GraphRAG:
+    # Number of recent queries whose graph neighborhoods are memoized
+    NEIGHBOR_CACHE_SIZE = 256
+    # Texts per SentenceTransformer forward pass when embedding new nodes
+    ENCODE_BATCH_SIZE = 128
+    # Seconds of a global query's deadline kept free for the reduce call
+    REDUCE_RESERVE_SECONDS = 10.0
+    # Seconds of a local query's deadline kept free for the answer call
+    GENERATION_RESERVE_SECONDS = 10.0
+    # Seconds before a failed background graph build is tried again
+    BUILD_RETRY_SECONDS = 300.0
+    # Characters of ranked map-stage points passed to the reduce call
+    GLOBAL_CONTEXT_CHARS = 8000
+    
+    def __init__(self, index, documents: List[Any], persist_dir: Optional[str] = None,
+                 similarity_top_k: int = 10, extraction_workers: int = 8,
+                 extraction_rate: float = 8.0, max_communities: int = 50,
+                 map_workers: int = 8, build_in_background: bool = True):
+        self.logger = logging.getLogger(__name__)
+        self.extraction_workers = extraction_workers
+        self.max_communities = max_communities
+        self.map_workers = map_workers
+        self.extraction_limiter = RateLimiter(extraction_rate)  # LLM extraction calls per second
+        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.embedding_model = load_sentence_transformer('all-MiniLM-L6-v2')  # Shared across agents
+        self.documents = documents  # Shared per-agent documents, used for graph building
+        self.store = GraphStore(persist_dir) if persist_dir else None
+        self.retriever = index.as_retriever(similarity_top_k=similarity_top_k)
+        self._neighbor_cache: "OrderedDict[Tuple[str, int], List[int]]" = OrderedDict()
+        self._neighbor_cache_lock = threading.Lock()
+        # Extraction and community summaries take minutes for a new corpus, so by default they
+        # run in the background; until then queries are answered from vector search alone
+        self.knowledge_graph: Optional[CompactGraph] = None
+        self.communities: List[Dict[str, Any]] = []
+        self._graph_ready = threading.Event()
+        self._build_lock = threading.Lock()
+        self._build_thread: Optional[threading.Thread] = None
+        self._build_failed_at: Optional[float] = None
+        if build_in_background:
+            self._start_build()
+        else:
+            self._build_graph()
+    
+    def _build_graph(self):
+        """Load or build the knowledge graph, then its community summaries"""
+        started = time.monotonic()
+        # Local queries can use the graph as soon as it exists; global ones wait for communities
+        self.knowledge_graph = self._build_knowledge_graph()
+        self.communities = self._build_communities()
+        self._graph_ready.set()
+        self.logger.info(f"Knowledge graph ready in {time.monotonic() - started:.1f}s")
+    
+    def _build_in_background(self):
+        try:
+            self._build_graph()
+        except Exception as e:
+            self._build_failed_at = time.monotonic()
+            self.logger.error(f"Knowledge graph build failed, answering from vector search only: {e}")
+    
+    def _start_build(self):
+        """Start the background build unless the graph is ready, building, or recently failed"""
+        with self._build_lock:
+            if self._graph_ready.is_set() or (self._build_thread and self._build_thread.is_alive()):
+                return
+            if self._build_failed_at is not None and \
+                    time.monotonic() - self._build_failed_at < self.BUILD_RETRY_SECONDS:
+                return
+            self._build_thread = threading.Thread(target=self._build_in_background, name="graph-build", daemon=True)
+            self._build_thread.start()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the graph and community summaries are built"""
+        return self._graph_ready.wait(timeout)
+    
+    def _extract_entities_and_relations(self, text: str) -> Dict[str, Any]:
+        """Extract entities and relationships from text using LLM"""
+        extraction_prompt = f"""
+        Extract entities and relationships from the following text. Focus on important nouns, concepts, people, organizations, and their relationships.
+        
+        Text: {text[:2000]}...
+        
+        Return the result in JSON format:
+        {{
+            "entities": [
+                {{"name": "entity_name", "type": "PERSON/ORGANIZATION/CONCEPT/LOCATION", "description": "brief description"}}
+            ],
+            "relationships": [
+                {{"source": "entity1", "target": "entity2", "relation": "relationship_type", "description": "brief description"}}
+            ]
+        }}
+        
+        Focus on the most important entities and relationships. Limit to top 10 entities and 10 relationships.
+        """
+        
+        try:
+            self.extraction_limiter.acquire()
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": extraction_prompt}],
+                temperature=0.1
+            )
+            
+            result = json.loads(response.choices[0].message.content)
+            return result
+            
+        except Exception as e:
+            self.logger.warning(f"Error extracting entities/relations: {e}")
+            # Fallback: simple entity extraction using regex
+            entities = []
+            # Extract capitalized words as potential entities
+            potential_entities = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', text)
+            for entity in set(potential_entities[:10]):  # Limit to 10 unique entities
+                entities.append({
+                    "name": entity,
+                    "type": "CONCEPT",
+                    "description": f"Entity extracted from text: {entity}"
+                })
+            
+            # Flagged so the document is extracted by the LLM again on the next build
+            return {
+                "entities": entities,
+                "relationships": [],
+                "fallback": True
+            }
+    
+    def _encode_nodes(self, texts: List[str]) -> np.ndarray:
+        """Encode new graph node texts in large batches"""
+        return self.embedding_model.encode(texts, batch_size=self.ENCODE_BATCH_SIZE)
+    
+    def _build_knowledge_graph(self) -> CompactGraph:
+        """Load the persisted knowledge graph, re-extracting only new or changed documents"""
+        documents = {}
+        for doc in self.documents:
+            documents.setdefault(content_hash(doc.text), doc.text)
+        self.graph_signature = content_hash("\n".join(sorted(documents)))
+        
+        text_store = self.store.text_store() if self.store else TextStore()
+        stored = self.store.load_graph(text_store) if self.store else None
+        extractions = self.store.load_extractions() if self.store else {}
+        # Regex fallbacks from failed LLM calls are retried until an extraction succeeds
+        retry = {doc_hash for doc_hash in documents if extractions.get(doc_hash, {}).get("fallback")}
+        if stored and stored["doc_hashes"] == set(documents) and not retry:
+            graph = stored["graph"]
+            self.logger.info(f"Loaded knowledge graph with {graph.number_of_nodes()} nodes and {graph.number_of_edges()} edges")
+            return graph
+        
+        # Changed documents show up as a new content hash; removed ones are simply not
+        # reassembled, which drops every node and edge only they contributed
+        to_extract = [doc_hash for doc_hash in documents if doc_hash not in extractions or doc_hash in retry]
+        self.logger.info(f"Updating knowledge graph: {len(to_extract)} of {len(documents)} documents need extraction")
+        
+        # Extract entities and relationships for unseen content through a bounded, rate-limited pool
+        if to_extract:
+            self.logger.info(f"Extracting entities from {len(to_extract)} documents with {self.extraction_workers} workers")
+            with ThreadPoolExecutor(max_workers=self.extraction_workers,
+                                    thread_name_prefix="graph-extract") as pool:
+                results = pool.map(
+                    self._extract_entities_and_relations,
+                    [documents[doc_hash] for doc_hash in to_extract]
+                )
+                for doc_hash, extracted in zip(to_extract, results):
+                    extractions[doc_hash] = extracted
+        
+        # Node embeddings carry over from the previous graph; only new node texts are encoded
+        graph = build_compact_graph(
+            documents, extractions, text_store, self._encode_nodes,
+            previous=stored["graph"] if stored else None
+        )
+        
+        if self.store:
+            self.store.save_extractions({doc_hash: extractions[doc_hash] for doc_hash in documents})
+            self.store.save_graph(graph, documents.keys())
+        
+        self.logger.info(f"Knowledge graph built with {graph.number_of_nodes()} nodes and {graph.number_of_edges()} edges")
+        return graph
+    
+    def _summarize_community(self, members: List[int]) -> Dict[str, str]:
+        """Generate a title and summary for one community of the knowledge graph"""
+        graph = self.knowledge_graph
+        member_set = set(members)
+        # Most connected entities first
+        entities = sorted((node for node in members if not graph.is_document(node)),
+                          key=lambda node: -len(graph.neighbors(node)))[:25]
+        documents = [node for node in members if graph.is_document(node)][:3]
+        
+        relationships = []
+        for node in entities:
+            for neighbor, relation in graph.neighbor_relations(node):
+                if neighbor > node and neighbor in member_set and not graph.is_document(neighbor):
+                    relationships.append(f"- {graph.names[node]} → {relation} → {graph.names[neighbor]}")
+        
+        entity_lines = "\n".join(
+            f"- {graph.names[node]} ({graph.node_type_label(node)}): {graph.descriptions[node]}"
+            for node in entities
+        )
+        relationship_lines = "\n".join(relationships[:25])
+        excerpt_lines = "\n".join(f"- {graph.text(node, max_chars=300)}" for node in documents)
+        
+        summary_prompt = f"""
+        Write a report on the following community of related entities from a knowledge graph.
+        
+        Entities:
+        {entity_lines}
+        
+        Relationships:
+        {relationship_lines}
+        
+        Document excerpts:
+        {excerpt_lines}
+        
+        Return the result in JSON format:
+        {{
+            "title": "short name for the community",
+            "summary": "one paragraph describing the main themes, entities and how they relate"
+        }}
+        """
+        
+        try:
+            self.extraction_limiter.acquire()
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": summary_prompt}],
+                temperature=0.1
+            )
+            
+            result = json.loads(response.choices[0].message.content)
+            return {"title": result.get("title", ""), "summary": result.get("summary", "")}
+            
+        except Exception as e:
+            self.logger.warning(f"Error summarizing community: {e}")
+            # Fallback: list the community's entities
+            return {
+                "title": ", ".join(graph.names[node] for node in entities[:3]),
+                "summary": " ".join(
+                    f"{graph.names[node]}: {graph.descriptions[node]}." for node in entities[:10]
+                )
+            }
+    
+    def _build_communities(self) -> List[Dict[str, Any]]:
+        """Load community summaries, detecting communities and summarizing new ones when the graph changed"""
+        stored = self.store.load_communities() if self.store else None
+        if stored and stored["signature"] == self.graph_signature:
+            return stored["communities"]
+        
+        graph = self.knowledge_graph
+        # Communities whose membership is unchanged keep their summary
+        previous = {community["key"]: community for community in stored["communities"]} if stored else {}
+        communities = []
+        to_summarize = []
+        for members in detect_communities(graph)[:self.max_communities]:
+            key = community_key(graph, members)
+            if key in previous:
+                communities.append(previous[key])
+                continue
+            community = {"key": key, "size": len(members)}
+            communities.append(community)
+            to_summarize.append((community, members))
+        
+        if to_summarize:
+            self.logger.info(f"Summarizing {len(to_summarize)} of {len(communities)} graph communities")
+            with ThreadPoolExecutor(max_workers=self.extraction_workers,
+                                    thread_name_prefix="graph-summarize") as pool:
+                results = pool.map(self._summarize_community, [members for _, members in to_summarize])
+                for (community, _), summary in zip(to_summarize, results):
+                    community.update(summary)
+        
+        if self.store:
+            self.store.save_communities(self.graph_signature, communities)
+        return communities
+    
+    def _find_seed_nodes(self, query: str, top_k: int = 5, min_similarity: float = 0.3) -> List[int]:
+        """Find the graph nodes most similar to the query with one matrix-vector product"""
+        if self.knowledge_graph.number_of_nodes() == 0:
+            return []
+        
+        query_embedding = np.asarray(self.embedding_model.encode(query), dtype=np.float32)
+        query_norm = np.linalg.norm(query_embedding)
+        if query_norm == 0:
+            return []
+        # Graph embeddings are stored L2-normalized, so this is cosine similarity
+        similarities = self.knowledge_graph.embeddings @ (query_embedding / query_norm)
+        
+        # Partial selection of the top-k, then order just those k
+        if len(similarities) > top_k:
+            candidates = np.argpartition(-similarities, top_k)[:top_k]
+        else:
+            candidates = np.arange(len(similarities))
+        candidates = candidates[np.argsort(-similarities[candidates])]
+        
+        return [int(i) for i in candidates if similarities[i] > min_similarity]
+    
+    def _find_graph_neighbors(self, query: str, max_hops: int = 2) -> List[int]:
+        """Find relevant nodes in the graph based on query (memoized per query)"""
+        cache_key = (query, max_hops)
+        with self._neighbor_cache_lock:
+            if cache_key in self._neighbor_cache:
+                self._neighbor_cache.move_to_end(cache_key)
+                return list(self._neighbor_cache[cache_key])
+        
+        seed_nodes = self._find_seed_nodes(query)
+        
+        # Expand to neighbors
+        relevant_nodes = set(seed_nodes)
+        for seed in seed_nodes:
+            # Add direct neighbors
+            neighbors = self.knowledge_graph.neighbors(seed)
+            relevant_nodes.update(neighbors[:3].tolist())  # Limit neighbors per seed
+            
+            # Add second-hop neighbors for high-similarity seeds
+            if max_hops > 1:
+                for neighbor in neighbors[:2]:
+                    second_hop = self.knowledge_graph.neighbors(neighbor)
+                    relevant_nodes.update(second_hop[:2].tolist())
+        
+        result = list(relevant_nodes)
+        with self._neighbor_cache_lock:
+            self._neighbor_cache[cache_key] = result
+            if len(self._neighbor_cache) > self.NEIGHBOR_CACHE_SIZE:
+                self._neighbor_cache.popitem(last=False)
+        return list(result)
+    
+    def _get_graph_context(self, relevant_nodes: List[int]) -> str:
+        """Extract context from relevant graph nodes"""
+        graph = self.knowledge_graph
+        context_parts = []
+        
+        # Get document nodes (text read from the text store, first 500 chars)
+        doc_nodes = [node for node in relevant_nodes if graph.is_document(node)]
+        
+        for doc_node in doc_nodes:
+            context_parts.append(f"Document: {graph.text(doc_node, max_chars=500)}")
+        
+        # Get entity information
+        entity_nodes = [node for node in relevant_nodes if not graph.is_document(node)]
+        
+        if entity_nodes:
+            context_parts.append("\nRelevant Entities and Relationships:")
+            for entity in entity_nodes[:10]:  # Limit entities
+                context_parts.append(f"- {graph.names[entity]} ({graph.node_type_label(entity)}): {graph.descriptions[entity]}")
+                
+                # Add key relationships
+                for neighbor, relation in graph.neighbor_relations(entity)[:3]:  # Limit relationships per entity
+                    context_parts.append(f"  → {relation} → {graph.names[neighbor]}")
+        
+        return "\n".join(context_parts)
+    
+    def _hybrid_retrieval(self, query: str, deadline: Optional[float] = None) -> Tuple[str, str]:
+        """Perform hybrid retrieval using both vector similarity and graph traversal
+        
+        Both run concurrently; whichever has not finished when the deadline (minus the
+        generation reserve) hits contributes no context.
+        """
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="graph-retrieve")
+        # Vector-based retrieval
+        vector_future = pool.submit(self.retriever.retrieve, query)
+        # Graph-based retrieval, once the graph has been built
+        graph_future = None
+        if self.knowledge_graph is not None:
+            graph_future = pool.submit(lambda: self._get_graph_context(self._find_graph_neighbors(query)))
+        timeout = None
+        if deadline is not None:
+            timeout = max(0.0, deadline - time.monotonic() - self.GENERATION_RESERVE_SECONDS)
+        wait([future for future in (vector_future, graph_future) if future is not None], timeout=timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+        
+        vector_context = ""
+        if vector_future.done():
+            vector_context = "\n\n".join([node.text for node in vector_future.result()[:5]])
+        else:
+            self.logger.warning("Vector retrieval missed the deadline")
+        graph_context = ""
+        if graph_future is not None and graph_future.done():
+            graph_context = graph_future.result()
+        elif graph_future is not None:
+            self.logger.warning("Graph traversal missed the deadline")
+        
+        return vector_context, graph_context
+    
+    def _is_global_question(self, question: str) -> bool:
+        return bool(GLOBAL_QUESTION_PATTERN.search(question))
+    
+    def _map_community(self, question: str, community: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Extract the points of one community summary that help answer the question"""
+        map_prompt = f"""
+        Using only the community report below, list the points that help answer the question.
+        Rate each point's importance for answering the question from 0 to 100.
+        
+        Question: {question}
+        
+        Community report - {community.get("title", "")}:
+        {community.get("summary", "")}
+        
+        Return the result in JSON format:
+        {{
+            "points": [
+                {{"description": "point relevant to the question", "score": 0}}
+            ]
+        }}
+        
+        Return an empty list if the report is not relevant.
+        """
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": map_prompt}],
+                temperature=0.1
+            )
+            
+            result = json.loads(response.choices[0].message.content)
+            return [point for point in result.get("points", [])
+                    if point.get("description") and float(point.get("score", 0)) > 0]
+            
+        except Exception as e:
+            self.logger.warning(f"Error mapping community {community.get('title', '')}: {e}")
+            return []
+    
+    def _global_query(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Answer a corpus-wide question by map-reduce over the community summaries"""
+        self.logger.info(f"Starting Graph RAG global query over {len(self.communities)} communities: {question}")
+        
+        # Map: score every community summary against the question in a bounded pool,
+        # keeping whatever finished when the deadline (minus the reduce reserve) hits
+        pool = ThreadPoolExecutor(max_workers=self.map_workers, thread_name_prefix="graph-map")
+        futures = [pool.submit(self._map_community, question, community) for community in self.communities]
+        timeout = None
+        if deadline is not None:
+            timeout = max(0.0, deadline - time.monotonic() - self.REDUCE_RESERVE_SECONDS)
+        done, not_done = wait(futures, timeout=timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+        if not_done:
+            self.logger.warning(f"Global query deadline reached with {len(not_done)} communities unmapped")
+        
+        points = sorted(
+            (point for future in done for point in future.result()),
+            key=lambda point: -float(point.get("score", 0))
+        )
+        
+        # Reduce: combine the highest-rated points into one answer
+        context_parts = []
+        context_chars = 0
+        for point in points:
+            line = f"- {point['description']}"
+            if context_chars + len(line) > self.GLOBAL_CONTEXT_CHARS:
+                break
+            context_parts.append(line)
+            context_chars += len(line)
+        global_context = "\n".join(context_parts)
+        
+        if not context_parts:
+            final_response = "I could not find information in the documents to answer this question."
+        else:
+            reduce_prompt = f"""
+            You are an AI assistant answering a question about a whole document collection.
+            
+            Question: {question}
+            
+            Key points gathered from summaries of the collection, most important first:
+            {global_context}
+            
+            Instructions:
+            1. Synthesize the points into a comprehensive, well-structured answer
+            2. Group related points into themes
+            3. Do not add information that is not supported by the points
+            
+            Provide your answer:
+            """
+            
+            try:
+                response = self.openai_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": reduce_prompt}],
+                    temperature=0.3
+                )
+                
+                final_response = response.choices[0].message.content
+                
+            except Exception as e:
+                self.logger.error(f"Error generating response: {e}")
+                final_response = "I apologize, but I encountered an error while generating the response."
+        
+        return {
+            "query": question,
+            "mode": "global",
+            "graph_context": global_context,
+            "final_response": final_response,
+            "communities_mapped": len(done),
+            "communities_total": len(self.communities),
+            "graph_stats": {
+                "total_nodes": self.knowledge_graph.number_of_nodes(),
+                "total_edges": self.knowledge_graph.number_of_edges(),
+                "communities": len(self.communities)
+            }
+        }
+    
+    def query(self, question: str, deadline: Optional[float] = None, mode: str = "auto") -> Dict[str, Any]:
+        """
+        Main query method that implements graph-enhanced RAG
+        
+        mode "global" answers from the community summaries, "local" from seed-node
+        expansion; "auto" picks global for broad questions about the whole corpus.
+        """
+        # Restarts a background build that failed earlier
+        self._start_build()
+        
+        if mode == "global" or (mode == "auto" and self._is_global_question(question)):
+            if self._graph_ready.is_set() and self.communities:
+                return self._global_query(question, deadline)
+            self.logger.info("No graph communities available, answering globally-phrased question locally")
+        
+        self.logger.info(f"Starting Graph RAG query: {question}")
+        
+        # Perform hybrid retrieval
+        vector_context, graph_context = self._hybrid_retrieval(question, deadline)
+        
+        # Combine contexts
+        combined_context = f"""
+        === Vector-based Context ===
+        {vector_context}
+        
+        === Graph-based Context ===
+        {graph_context}
+        """
+        
+        # Generate response using combined context
+        response_prompt = f"""
+        You are an AI assistant that provides comprehensive answers by combining information from both semantic similarity and knowledge graph relationships.
+        
+        Question: {question}
+        
+        Context from vector similarity search:
+        {vector_context[:2000]}
+        
+        Context from knowledge graph:
+        {graph_context[:2000]}
+        
+        Instructions:
+        1. Use information from both contexts to provide a comprehensive answer
+        2. Pay attention to relationships and connections revealed by the knowledge graph
+        3. If the contexts provide complementary information, synthesize them
+        4. If there are conflicts, acknowledge them and explain
+        5. Mention how the graph relationships enhance your understanding
+        
+        Provide a detailed, well-structured response:
+        """
+        
+        # The answer call gets whatever is left of the deadline (at least a few seconds)
+        request_options = {}
+        if deadline is not None:
+            request_options["timeout"] = max(5.0, deadline - time.monotonic())
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": response_prompt}],
+                temperature=0.3,
+                **request_options
+            )
+            
+            final_response = response.choices[0].message.content
+            
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            final_response = "I apologize, but I encountered an error while generating the response."
+        
+        graph = self.knowledge_graph
+        return {
+            "query": question,
+            "mode": "local",
+            "graph_ready": self._graph_ready.is_set(),
+            "vector_context": vector_context,
+            "graph_context": graph_context,
+            "combined_context": combined_context,
+            "final_response": final_response,
+            "graph_stats": {
+                "total_nodes": graph.number_of_nodes(),
+                "total_edges": graph.number_of_edges(),
+                # Memoized by the retrieval above; skipped when that missed the deadline
+                "relevant_nodes": len(self._find_graph_neighbors(question)) if graph_context else 0
+            } if graph is not None else {}
+        }
+
+def run_graph_rag_query(query: str, index, documents: List[Any], persist_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run a Graph RAG query
+    
+    Args:
+        query: The user's question
+        index: Vector index holding the agent's documents
+        documents: Documents the knowledge graph is built from
+        persist_dir: Directory the knowledge graph is loaded from and saved to
+    
+    Returns:
+        Dictionary containing contexts, graph info, and final response
+    """
+    try:
+        graph_rag = GraphRAG(index, documents, persist_dir=persist_dir, build_in_background=False)
+        result = graph_rag.query(query)
+        return result
+        
+    except Exception as e:
+        logging.error(f"Error in Graph RAG query: {e}")
+        return {
+            "error": str(e),
+            "final_response": "I apologize, but I encountered an error while processing your query."
+        }
+
+if __name__ == "__main__":
+    # Test the Graph RAG implementation
+    logging.basicConfig(level=logging.INFO)
+    
+    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+    
+    documents = SimpleDirectoryReader('data').load_data()
+    index = VectorStoreIndex.from_documents(documents)
+    
+    test_query = "How do artificial intelligence and machine learning technologies relate to business automation?"
+    result = run_graph_rag_query(test_query, index, documents)
+    
+    print("=== Graph RAG Results ===")
+    print(f"Query: {result['query']}")
+    
+    if 'graph_stats' in result:
+        stats = result['graph_stats']
+        print(f"Graph Stats: {stats['total_nodes']} nodes, {stats['total_edges']} edges")
+        print(f"Relevant nodes found: {stats['relevant_nodes']}")
+    
+    print(f"\n=== Final Response ===")
+    print(result['final_response'])
+    
+    if 'error' not in result:
+        print(f"\n=== Graph Context Sample ===")
+        print(result['graph_context'][:500] + "..." if len(result['graph_context']) > 500 else result['graph_context'])
@@ -0,0 +1,429 @@
+"""
+Graph Store
+Compact knowledge graph representation for GraphRAG, persisted together with the
+per-document extraction results (keyed by document content hash) so graphs can be
+loaded and updated incrementally instead of being rebuilt on every startup.
+
+In memory a graph is a CompactGraph: integer node IDs, CSR adjacency arrays with
+interned relation labels, one shared float32 embedding matrix, and document text
+served from a TextStore by byte offset.
+
+Layout of a store directory:
+    extractions.json  - {content_hash: {"entities": [...], "relationships": [...]}}
+                        ("fallback": true marks regex results to re-extract)
+    texts.bin         - UTF-8 document texts, concatenated
+    graph.npz         - compressed CompactGraph arrays plus a JSON metadata string
+    communities.json  - community summaries for global questions, keyed by membership
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+
+DOCUMENT_TYPE = "DOCUMENT"
+CONTAINS_RELATION = "CONTAINS"
+
+def content_hash(text: str) -> str:
+    """Stable identifier for a document's content"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def document_node_name(doc_hash: str) -> str:
+    return f"doc_{doc_hash[:12]}"
+
+def _atomic_write(path: Path, write):
+    """Write through a temporary file so readers never see a partial store"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            write(handle)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class TextStore:
+    """Document texts concatenated in one UTF-8 blob, addressed by (offset, length) in bytes.
+
+    With a path the blob lives on disk and is memory-mapped; without one it is kept in memory.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._blob: Any = b""
+        self._file = None
+        if self.path and self.path.exists():
+            self._open()
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._blob = b""
+
+    def close(self):
+        with self._lock:
+            if isinstance(self._blob, mmap.mmap):
+                self._blob.close()
+            if self._file:
+                self._file.close()
+            self._blob, self._file = b"", None
+
+    def write(self, texts: Iterable[Tuple[str, str]]) -> Dict[str, Tuple[int, int]]:
+        """Replace the store contents, returning {key: (offset, length)} for each text"""
+        locations: Dict[str, Tuple[int, int]] = {}
+        chunks: List[bytes] = []
+        offset = 0
+        for key, text in texts:
+            data = text.encode("utf-8")
+            locations[key] = (offset, len(data))
+            chunks.append(data)
+            offset += len(data)
+        blob = b"".join(chunks)
+
+        if self.path is None:
+            with self._lock:
+                self._blob = blob
+            return locations
+
+        # Release the current mapping first; Windows cannot replace a mapped file
+        self.close()
+        _atomic_write(self.path, lambda handle: handle.write(blob))
+        with self._lock:
+            self._open()
+        return locations
+
+    def read(self, offset: int, length: int, max_chars: Optional[int] = None) -> str:
+        """Read a text, optionally only its first max_chars characters"""
+        if max_chars is not None:
+            # A UTF-8 character is at most 4 bytes
+            length = min(length, max_chars * 4)
+        with self._lock:
+            data = bytes(self._blob[offset:offset + length])
+        text = data.decode("utf-8", errors="ignore")
+        return text[:max_chars] if max_chars is not None else text
+
+class CompactGraph:
+    """Undirected knowledge graph stored as flat arrays indexed by integer node ID"""
+
+    def __init__(self, names: List[str], node_type: np.ndarray, type_labels: List[str],
+                 descriptions: List[str], text_offset: np.ndarray, text_length: np.ndarray,
+                 embeddings: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+                 edge_relation: np.ndarray, relation_labels: List[str], edge_count: int,
+                 text_store: TextStore):
+        self.names = names
+        self.name_to_id = {name: i for i, name in enumerate(names)}
+        self.node_type = node_type            # int16 index into type_labels
+        self.type_labels = type_labels
+        self.descriptions = descriptions      # "" for document nodes
+        self.text_offset = text_offset        # int64 byte offset into text_store, -1 if no text
+        self.text_length = text_length        # int64 byte length
+        self.embeddings = embeddings          # float32, L2-normalized rows
+        self.indptr = indptr                  # int64, neighbors of i are indices[indptr[i]:indptr[i+1]]
+        self.indices = indices                # int32 neighbor IDs
+        self.edge_relation = edge_relation    # int32 index into relation_labels, parallel to indices
+        self.relation_labels = relation_labels
+        self.edge_count = edge_count
+        self.text_store = text_store
+
+    def number_of_nodes(self) -> int:
+        return len(self.names)
+
+    def number_of_edges(self) -> int:
+        return self.edge_count
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def neighbor_relations(self, node: int) -> List[Tuple[int, str]]:
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return [(int(neighbor), self.relation_labels[relation])
+                for neighbor, relation in zip(self.indices[start:end], self.edge_relation[start:end])]
+
+    def node_type_label(self, node: int) -> str:
+        return self.type_labels[self.node_type[node]]
+
+    def is_document(self, node: int) -> bool:
+        return self.type_labels[self.node_type[node]] == DOCUMENT_TYPE
+
+    def text(self, node: int, max_chars: Optional[int] = None) -> str:
+        if self.text_offset[node] < 0:
+            return ""
+        return self.text_store.read(int(self.text_offset[node]), int(self.text_length[node]), max_chars)
+
+    def nbytes(self) -> int:
+        """Approximate size of the array payload"""
+        return sum(array.nbytes for array in (
+            self.node_type, self.text_offset, self.text_length, self.embeddings,
+            self.indptr, self.indices, self.edge_relation
+        ))
+
+def build_compact_graph(documents: Dict[str, str], extractions: Dict[str, Dict[str, Any]],
+                        text_store: TextStore, encode: Callable[[List[str]], np.ndarray],
+                        previous: Optional[CompactGraph] = None) -> CompactGraph:
+    """Assemble a CompactGraph from per-document extraction results.
+
+    documents maps content hash -> text. Embeddings of nodes already present in the
+    previous graph are reused; only new node texts are passed to encode, in one batch.
+    """
+    names: List[str] = []
+    name_to_id: Dict[str, int] = {}
+    types: List[int] = []
+    type_ids: Dict[str, int] = {}
+    descriptions: List[str] = []
+    adjacency: List[List[Tuple[int, int]]] = []
+    relation_ids: Dict[str, int] = {}
+    seen_edges = set()
+    embed_texts: Dict[int, str] = {}
+
+    def add_node(name: str, node_type: str, description: str, embed_text: str) -> int:
+        node = name_to_id.get(name)
+        if node is None:
+            node = len(names)
+            name_to_id[name] = node
+            names.append(name)
+            types.append(type_ids.setdefault(node_type, len(type_ids)))
+            descriptions.append(description)
+            adjacency.append([])
+            embed_texts[node] = embed_text
+        return node
+
+    def add_edge(source: int, target: int, relation: str):
+        key = (min(source, target), max(source, target))
+        if key in seen_edges:
+            return
+        seen_edges.add(key)
+        relation_id = relation_ids.setdefault(relation, len(relation_ids))
+        adjacency[source].append((target, relation_id))
+        if source != target:
+            adjacency[target].append((source, relation_id))
+
+    doc_hashes = sorted(documents)
+    locations = text_store.write((doc_hash, documents[doc_hash]) for doc_hash in doc_hashes)
+    doc_nodes: Dict[int, str] = {}
+
+    for doc_hash in doc_hashes:
+        extracted = extractions.get(doc_hash, {})
+        doc_node = add_node(document_node_name(doc_hash), DOCUMENT_TYPE, "", documents[doc_hash])
+        doc_nodes[doc_node] = doc_hash
+
+        for entity in extracted.get("entities", []):
+            entity_node = add_node(entity["name"], entity.get("type", "CONCEPT"),
+                                   entity.get("description", ""), entity["name"])
+            add_edge(doc_node, entity_node, CONTAINS_RELATION)
+
+        for relation in extracted.get("relationships", []):
+            source = add_node(relation["source"], "CONCEPT", "Auto-added entity", relation["source"])
+            target = add_node(relation["target"], "CONCEPT", "Auto-added entity", relation["target"])
+            add_edge(source, target, relation.get("relation", "RELATED_TO"))
+
+    node_count = len(names)
+    text_offset = np.full(node_count, -1, dtype=np.int64)
+    text_length = np.zeros(node_count, dtype=np.int64)
+    for node, doc_hash in doc_nodes.items():
+        text_offset[node], text_length[node] = locations[doc_hash]
+
+    # Reuse embeddings from the previous graph, encode the rest in one batch
+    reuse_rows: List[int] = []
+    reuse_from: List[int] = []
+    to_encode: List[int] = []
+    for node, name in enumerate(names):
+        previous_node = previous.name_to_id.get(name) if previous is not None else None
+        if previous_node is not None:
+            reuse_rows.append(node)
+            reuse_from.append(previous_node)
+        else:
+            to_encode.append(node)
+
+    dimension = previous.embeddings.shape[1] if previous is not None and previous.embeddings.size else 0
+    new_vectors = None
+    if to_encode:
+        logger.info(f"Encoding {len(to_encode)} new graph nodes")
+        new_vectors = np.asarray(encode([embed_texts[node] for node in to_encode]), dtype=np.float32)
+        dimension = new_vectors.shape[1]
+    embeddings = np.zeros((node_count, dimension), dtype=np.float32)
+    if reuse_rows:
+        embeddings[reuse_rows] = previous.embeddings[reuse_from]
+    if new_vectors is not None:
+        norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings[to_encode] = new_vectors / norms
+
+    # Flatten adjacency lists into CSR arrays, preserving insertion order
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(neighbors) for neighbors in adjacency])
+    indices = np.fromiter((neighbor for neighbors in adjacency for neighbor, _ in neighbors),
+                          dtype=np.int32, count=int(indptr[-1]))
+    edge_relation = np.fromiter((relation for neighbors in adjacency for _, relation in neighbors),
+                                dtype=np.int32, count=int(indptr[-1]))
+
+    return CompactGraph(
+        names=names,
+        node_type=np.asarray(types, dtype=np.int16),
+        type_labels=sorted(type_ids, key=type_ids.get),
+        descriptions=descriptions,
+        text_offset=text_offset,
+        text_length=text_length,
+        embeddings=np.ascontiguousarray(embeddings),
+        indptr=indptr,
+        indices=indices,
+        edge_relation=edge_relation,
+        relation_labels=sorted(relation_ids, key=relation_ids.get),
+        edge_count=len(seen_edges),
+        text_store=text_store,
+    )
+
+def detect_communities(graph: CompactGraph, min_size: int = 2,
+                       max_iterations: int = 20) -> List[List[int]]:
+    """Group nodes into communities by label propagation over the CSR adjacency.
+
+    Nodes are visited in a fixed pseudo-random order so results are reproducible.
+    Returns member lists, largest community first; smaller than min_size are dropped.
+    """
+    node_count = graph.number_of_nodes()
+    labels = np.arange(node_count, dtype=np.int64)
+    order = np.random.default_rng(0).permutation(node_count)
+
+    for _ in range(max_iterations):
+        changed = False
+        for node in order:
+            neighbors = graph.neighbors(node)
+            if not len(neighbors):
+                continue
+            values, counts = np.unique(labels[neighbors], return_counts=True)
+            best = values[counts == counts.max()]
+            # Keep the current label on ties so propagation settles
+            if labels[node] in best:
+                continue
+            labels[node] = best[0]
+            changed = True
+        if not changed:
+            break
+
+    groups: Dict[int, List[int]] = {}
+    for node, label in enumerate(labels.tolist()):
+        groups.setdefault(label, []).append(node)
+    communities = [members for members in groups.values() if len(members) >= min_size]
+    communities.sort(key=lambda members: (-len(members), members[0]))
+    return communities
+
+def community_key(graph: CompactGraph, members: Iterable[int]) -> str:
+    """Identify a community by its member names so summaries survive graph rebuilds"""
+    return content_hash("\n".join(sorted(graph.names[node] for node in members)))
+
+class GraphStore:
+    def __init__(self, persist_dir):
+        self.persist_dir = Path(persist_dir)
+        self.extractions_path = self.persist_dir / "extractions.json"
+        self.graph_path = self.persist_dir / "graph.npz"
+        self.texts_path = self.persist_dir / "texts.bin"
+        self.communities_path = self.persist_dir / "communities.json"
+
+    def text_store(self) -> TextStore:
+        return TextStore(self.texts_path)
+
+    def load_extractions(self) -> Dict[str, Dict[str, Any]]:
+        """Per-document extraction results keyed by content hash"""
+        if not self.extractions_path.exists():
+            return {}
+        try:
+            return json.loads(self.extractions_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable extraction cache {self.extractions_path}: {e}")
+            return {}
+
+    def save_extractions(self, extractions: Dict[str, Dict[str, Any]]):
+        payload = json.dumps(extractions, separators=(",", ":")).encode("utf-8")
+        _atomic_write(self.extractions_path, lambda handle: handle.write(payload))
+
+    def save_graph(self, graph: CompactGraph, doc_hashes: Iterable[str]):
+        meta = {
+            "version": FORMAT_VERSION,
+            "doc_hashes": sorted(doc_hashes),
+            "names": graph.names,
+            "descriptions": graph.descriptions,
+            "type_labels": graph.type_labels,
+            "relation_labels": graph.relation_labels,
+            "edge_count": graph.edge_count,
+        }
+
+        def write(handle):
+            np.savez_compressed(
+                handle,
+                meta=np.array(json.dumps(meta, separators=(",", ":"))),
+                node_type=graph.node_type,
+                text_offset=graph.text_offset,
+                text_length=graph.text_length,
+                embeddings=graph.embeddings,
+                indptr=graph.indptr,
+                indices=graph.indices,
+                edge_relation=graph.edge_relation,
+            )
+
+        _atomic_write(self.graph_path, write)
+
+    def load_graph(self, text_store: TextStore) -> Optional[Dict[str, Any]]:
+        """Load the stored graph, returning {"graph": CompactGraph, "doc_hashes": set} or None"""
+        if not self.graph_path.exists():
+            return None
+        try:
+            with np.load(self.graph_path, allow_pickle=False) as stored:
+                meta = json.loads(str(stored["meta"]))
+                if meta.get("version") != FORMAT_VERSION:
+                    return None
+                graph = CompactGraph(
+                    names=meta["names"],
+                    node_type=stored["node_type"],
+                    type_labels=meta["type_labels"],
+                    descriptions=meta["descriptions"],
+                    text_offset=stored["text_offset"],
+                    text_length=stored["text_length"],
+                    embeddings=stored["embeddings"],
+                    indptr=stored["indptr"],
+                    indices=stored["indices"],
+                    edge_relation=stored["edge_relation"],
+                    relation_labels=meta["relation_labels"],
+                    edge_count=meta["edge_count"],
+                    text_store=text_store,
+                )
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable graph store {self.graph_path}: {e}")
+            return None
+
+        return {"graph": graph, "doc_hashes": set(meta["doc_hashes"])}
+
+
+    def load_communities(self) -> Optional[Dict[str, Any]]:
+        """Stored community summaries as {"signature": str, "communities": [...]}, or None"""
+        if not self.communities_path.exists():
+            return None
+        try:
+            stored = json.loads(self.communities_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable community summaries {self.communities_path}: {e}")
+            return None
+        if stored.get("version") != FORMAT_VERSION:
+            return None
+        return stored
+
+    def save_communities(self, signature: str, communities: List[Dict[str, Any]]):
+        payload = json.dumps({
+            "version": FORMAT_VERSION,
+            "signature": signature,
+            "communities": communities,
+        }, separators=(",", ":")).encode("utf-8")
+        _atomic_write(self.communities_path, lambda handle: handle.write(payload))
@@ -0,0 +1,137 @@
+"""
+Local grounding scorer shared by the self-evaluating RAG strategies
+Measures how much of a response is covered by the retrieved chunks with sentence-level
+lexical overlap (unigrams and bigrams), so an LLM judge is only needed for unclear cases.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Sequence, Set, Tuple
+
+import numpy as np
+
+# Decision thresholds on the scores below
+SUPPORTED_SENTENCE_SCORE = 0.6    # a sentence counts as supported from here
+CLEARLY_GROUNDED_FRACTION = 0.9   # share of supported sentences for a confident "grounded"
+CLEARLY_UNGROUNDED_SCORE = 0.25   # mean sentence score for a confident "ungrounded"
+
+# Sentences with fewer content words (headings, filler) are not scored
+MIN_SENTENCE_TOKENS = 3
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have how i if in into
+is it its may might more most of on or our should so such than that the their them then
+there these they this those to was we were what when where which while who why will with would
+you your also about over other any all each both just only very
+""".split())
+# Negations stay content words; a response that flips one is checked by the LLM judge
+_NEGATION = re.compile(r"\b(?:no|not|never|nor|none|neither|cannot|without)\b|n['’]t\b")
+
+@dataclass
+class GroundingResult:
+    score: float                      # mean sentence support, 0-1
+    supported_fraction: float         # share of sentences at or above SUPPORTED_SENTENCE_SCORE
+    verdict: str                      # "grounded", "ungrounded" or "uncertain"
+    supported: List[str] = field(default_factory=list)
+    unsupported: List[str] = field(default_factory=list)
+
+def content_tokens(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT.split(text) if sentence.strip()]
+
+def _bigrams(tokens: Sequence[str]) -> Set[str]:
+    return {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+def _negated(text: str) -> bool:
+    return _NEGATION.search(text.lower()) is not None
+
+def _overlap(sentence_features: List[Set[str]], chunk_features: List[Set[str]]) -> np.ndarray:
+    """Fraction of each sentence's features found in each chunk (sentences x chunks)"""
+    vocabulary = {}
+    for features in sentence_features:
+        for feature in features:
+            vocabulary.setdefault(feature, len(vocabulary))
+    if not vocabulary or not chunk_features:
+        return np.zeros((len(sentence_features), 0), dtype=np.float32)
+
+    sentences = np.zeros((len(sentence_features), len(vocabulary)), dtype=np.float32)
+    for row, features in enumerate(sentence_features):
+        sentences[row, [vocabulary[feature] for feature in features]] = 1.0
+    chunks = np.zeros((len(chunk_features), len(vocabulary)), dtype=np.float32)
+    for row, features in enumerate(chunk_features):
+        columns = [vocabulary[feature] for feature in features if feature in vocabulary]
+        chunks[row, columns] = 1.0
+
+    overlap = sentences @ chunks.T
+    sizes = np.maximum(sentences.sum(axis=1, keepdims=True), 1.0)
+    return overlap / sizes
+
+def _containment(sentence_features: List[Set[str]], chunk_features: List[Set[str]]) -> np.ndarray:
+    """For each sentence, the largest fraction of its features found in any single chunk"""
+    overlap = _overlap(sentence_features, chunk_features)
+    if overlap.shape[1] == 0:
+        return np.zeros(len(sentence_features), dtype=np.float32)
+    return overlap.max(axis=1)
+
+def _negation_mismatches(sentences: List[Tuple[str, List[str]]], chunks: Sequence[str]) -> List[bool]:
+    """Whether each sentence and its closest source sentence disagree on negation
+
+    Overlap scores barely move when a claim adds or drops a "not", so a contradiction of
+    the source would otherwise count as supported.
+    """
+    source_sentences = [sentence for chunk in chunks for sentence in split_sentences(chunk)]
+    overlap = _overlap([set(tokens) for _, tokens in sentences],
+                       [set(content_tokens(sentence)) for sentence in source_sentences])
+    if overlap.shape[1] == 0:
+        return [False] * len(sentences)
+    closest = overlap.argmax(axis=1)
+    return [_negated(sentence) != _negated(source_sentences[row])
+            for (sentence, _), row in zip(sentences, closest)]
+
+def score_grounding(response: str, chunks: Sequence[str]) -> GroundingResult:
+    """Score how well the response's sentences are supported by the retrieved chunks"""
+    sentences: List[Tuple[str, List[str]]] = []
+    for sentence in split_sentences(response):
+        tokens = content_tokens(sentence)
+        if len(tokens) >= MIN_SENTENCE_TOKENS:
+            sentences.append((sentence, tokens))
+    if not sentences:
+        return GroundingResult(score=0.0, supported_fraction=0.0, verdict="uncertain")
+
+    chunk_tokens = [content_tokens(chunk) for chunk in chunks if chunk.strip()]
+    unigram_scores = _containment([set(tokens) for _, tokens in sentences],
+                                  [set(tokens) for tokens in chunk_tokens])
+    bigram_scores = _containment([_bigrams(tokens) for _, tokens in sentences],
+                                 [_bigrams(tokens) for tokens in chunk_tokens])
+    # Bigrams reward phrases copied or closely paraphrased from the source
+    sentence_scores = 0.5 * unigram_scores + 0.5 * bigram_scores
+
+    mismatches = _negation_mismatches(sentences, chunks)
+    supported = [sentence for (sentence, _), score, mismatch in zip(sentences, sentence_scores, mismatches)
+                 if score >= SUPPORTED_SENTENCE_SCORE and not mismatch]
+    unsupported = [sentence for (sentence, _), score, mismatch in zip(sentences, sentence_scores, mismatches)
+                   if score < SUPPORTED_SENTENCE_SCORE or mismatch]
+    score = float(sentence_scores.mean())
+    supported_fraction = len(supported) / len(sentences)
+
+    if any(mismatches):
+        # Possible contradiction of the source: leave the call to the LLM judge
+        verdict = "uncertain"
+    elif supported_fraction >= CLEARLY_GROUNDED_FRACTION:
+        verdict = "grounded"
+    elif score <= CLEARLY_UNGROUNDED_SCORE:
+        verdict = "ungrounded"
+    else:
+        verdict = "uncertain"
+    return GroundingResult(score=score, supported_fraction=supported_fraction, verdict=verdict,
+                           supported=supported, unsupported=unsupported)
+
+def query_coverage(question: str, response: str) -> float:
+    """Share of the question's content words that the response mentions"""
+    question_tokens = set(content_tokens(question))
+    if not question_tokens:
+        return 1.0
+    return len(question_tokens & set(content_tokens(response))) / len(question_tokens)
@@ -0,0 +1,234 @@
+"""
+CPU inference backends for the local sentence-transformers models
+Models run in full-precision PyTorch by default. Setting RAG_INFERENCE_BACKEND to "onnx" or
+"onnx-int8" loads an exported ONNX model instead (dynamically quantized to int8 for the
+latter). The optimized model is checked against PyTorch on a small calibration set when it
+loads, and stays on PyTorch if the outputs drift past the tolerance.
+
+Benchmark: python rag_inference.py [--kind cross-encoder|embedding] [--threads N]
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.getenv("RAG_INFERENCE_BACKEND", "torch")
+
+# Exported and quantized models are written here (outside data/agents so they are not indexed)
+MODEL_DIR = Path("data/models")
+# onnxruntime quantization preset matching the CPU: arm64, avx2, avx512 or avx512_vnni
+QUANTIZATION_CONFIG = os.getenv("RAG_QUANTIZATION_CONFIG", "avx2")
+
+# Largest tolerated deviation from PyTorch on the calibration set
+CROSS_ENCODER_MAX_ABS_ERROR = 0.15   # relevance logits
+EMBEDDING_MIN_COSINE = 0.99          # per-text cosine similarity to the PyTorch embedding
+
+CALIBRATION_QUERIES = [
+    "What is the refund policy for annual plans?",
+    "How do I configure the vector index dimension?",
+    "Who approved the 2023 budget revision?",
+    "Summarize the onboarding process for new engineers",
+]
+CALIBRATION_PASSAGES = [
+    "Annual plans can be refunded in full within 30 days of purchase; after that, refunds are prorated.",
+    "The index dimension must match the embedding model, for example 1536 for text-embedding-ada-002.",
+    "The finance committee approved the revised 2023 budget in its March meeting.",
+    "New engineers pair with a mentor during their first two weeks and ship a small change in week one.",
+    "Our office is closed on public holidays.",
+]
+
+def _calibration_pairs() -> List[Tuple[str, str]]:
+    return [(query, passage) for query in CALIBRATION_QUERIES for passage in CALIBRATION_PASSAGES]
+
+def _model_class(kind: str):
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+    return CrossEncoder if kind == "cross-encoder" else SentenceTransformer
+
+def _onnx_session_kwargs(threads: Optional[int]) -> Dict[str, Any]:
+    if not threads:
+        return {}
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    return {"session_options": options}
+
+def _export_dir(model_name: str) -> Path:
+    return MODEL_DIR / model_name.replace("/", "--")
+
+def _load(kind: str, model_name: str, backend: str, threads: Optional[int] = None):
+    """Construct a model on the given backend, exporting/quantizing it on first use"""
+    model_class = _model_class(kind)
+    if backend == "torch":
+        return model_class(model_name)
+    if backend == "onnx":
+        return model_class(model_name, backend="onnx", model_kwargs=_onnx_session_kwargs(threads))
+
+    export_dir = _export_dir(model_name)
+    file_name = f"onnx/model_qint8_{QUANTIZATION_CONFIG}.onnx"
+    if not (export_dir / file_name).exists():
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        logger.info(f"Quantizing {model_name} to int8 ({QUANTIZATION_CONFIG}) in {export_dir}")
+        exported = model_class(model_name, backend="onnx")
+        exported.save_pretrained(str(export_dir))
+        export_dynamic_quantized_onnx_model(exported, QUANTIZATION_CONFIG, str(export_dir))
+    model_kwargs = {"file_name": file_name, **_onnx_session_kwargs(threads)}
+    return model_class(str(export_dir), backend="onnx", model_kwargs=model_kwargs)
+
+def _calibration_outputs(kind: str, model) -> np.ndarray:
+    if kind == "cross-encoder":
+        return np.asarray(model.predict(_calibration_pairs(), show_progress_bar=False), dtype=np.float32)
+    texts = CALIBRATION_QUERIES + CALIBRATION_PASSAGES
+    return np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+def compare_outputs(kind: str, reference: np.ndarray, candidate: np.ndarray) -> Tuple[bool, float]:
+    """Whether candidate outputs are within tolerance of the reference, and the worst deviation"""
+    if reference.shape != candidate.shape:
+        return False, float("inf")
+    if kind == "cross-encoder":
+        error = float(np.max(np.abs(reference - candidate)))
+        return error <= CROSS_ENCODER_MAX_ABS_ERROR, error
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = np.sum(reference * candidate, axis=1) / np.maximum(norms, 1e-12)
+    worst = float(np.min(cosines))
+    return worst >= EMBEDDING_MIN_COSINE, 1.0 - worst
+
+# Each model is built once; later callers wait on its future instead of on _models_lock,
+# which only guards the dicts so one slow export does not block other models or loaded_models()
+_models: Dict[Tuple[str, str, str, Optional[int]], Future] = {}
+_model_info: Dict[Tuple[str, str, str, Optional[int]], Dict[str, Any]] = {}
+_models_lock = threading.Lock()
+
+def _build_checked(kind: str, model_name: str, backend: str, threads: Optional[int]) -> Tuple[Any, Dict[str, Any]]:
+    """Load the model on the backend, keeping PyTorch if the backend fails or drifts"""
+    started = time.monotonic()
+    reference = _load(kind, model_name, "torch")
+    model, info = reference, {"kind": kind, "model": model_name, "requested_backend": backend,
+                              "backend": "torch", "deviation": 0.0}
+    if backend != "torch":
+        try:
+            candidate = _load(kind, model_name, backend, threads)
+            within, deviation = compare_outputs(kind, _calibration_outputs(kind, reference),
+                                                _calibration_outputs(kind, candidate))
+            info["deviation"] = round(deviation, 5)
+            if within:
+                model, info["backend"] = candidate, backend
+            else:
+                logger.warning(f"{backend} {model_name} deviates from PyTorch by {deviation:.4f}, "
+                               f"keeping PyTorch")
+        except Exception as e:
+            logger.warning(f"Could not load {model_name} with {backend}, keeping PyTorch: {e}")
+            info["error"] = str(e)
+    info["load_seconds"] = round(time.monotonic() - started, 2)
+    logger.info(f"Loaded {kind} {model_name} on {info['backend']} in {info['load_seconds']}s")
+    return model, info
+
+def _load_checked(kind: str, model_name: str, backend: Optional[str], threads: Optional[int]):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown inference backend {backend}, using torch")
+        backend = "torch"
+    key = (kind, model_name, backend, threads)
+    with _models_lock:
+        future = _models.get(key)
+        owner = future is None
+        if owner:
+            future = _models[key] = Future()
+    if owner:
+        try:
+            model, info = _build_checked(kind, model_name, backend, threads)
+        except Exception as e:
+            # Failed loads are not cached; the next caller tries again
+            with _models_lock:
+                if _models.get(key) is future:
+                    del _models[key]
+            future.set_exception(e)
+        else:
+            with _models_lock:
+                _model_info[key] = info
+            future.set_result(model)
+    return future.result()
+
+def load_cross_encoder(model_name: str, backend: Optional[str] = None, threads: Optional[int] = None):
+    """Process-wide CrossEncoder on the configured backend"""
+    return _load_checked("cross-encoder", model_name, backend, threads)
+
+def load_sentence_transformer(model_name: str, backend: Optional[str] = None, threads: Optional[int] = None):
+    """Process-wide SentenceTransformer on the configured backend"""
+    return _load_checked("embedding", model_name, backend, threads)
+
+def loaded_models() -> List[Dict[str, Any]]:
+    with _models_lock:
+        return [dict(info) for info in _model_info.values()]
+
+def benchmark(kind: str, model_name: str, backends=BACKENDS, threads: int = 1,
+              batch_size: int = 32, seconds: float = 5.0) -> List[Dict[str, Any]]:
+    """Throughput of each backend on the calibration data, in items per second per core"""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    items = _calibration_pairs() if kind == "cross-encoder" else CALIBRATION_QUERIES + CALIBRATION_PASSAGES
+    batch = (items * (batch_size // len(items) + 1))[:batch_size]
+    reference_outputs = None
+    results = []
+    for backend in backends:
+        try:
+            model = _load(kind, model_name, backend, threads)
+        except Exception as e:
+            results.append({"backend": backend, "error": str(e)})
+            continue
+        outputs = _calibration_outputs(kind, model)
+        if reference_outputs is None:
+            reference_outputs = outputs
+        within, deviation = compare_outputs(kind, reference_outputs, outputs)
+
+        run = (lambda: model.predict(batch, batch_size=batch_size, show_progress_bar=False)) \
+            if kind == "cross-encoder" else (lambda: model.encode(batch, batch_size=batch_size))
+        run()  # Warm up
+        processed = 0
+        started = time.monotonic()
+        while time.monotonic() - started < seconds:
+            run()
+            processed += len(batch)
+        elapsed = time.monotonic() - started
+        results.append({
+            "backend": backend,
+            "items_per_second": round(processed / elapsed, 1),
+            "items_per_second_per_core": round(processed / elapsed / threads, 1),
+            "deviation": round(deviation, 5),
+            "within_tolerance": within,
+        })
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark CPU inference backends")
+    parser.add_argument("--kind", choices=["cross-encoder", "embedding"], default="cross-encoder")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    model_name = args.model or ("cross-encoder/ms-marco-MiniLM-L-6-v2" if args.kind == "cross-encoder"
+                                else "all-MiniLM-L6-v2")
+    print(f"{args.kind} {model_name}, {args.threads} thread(s), batch {args.batch_size}")
+    for row in benchmark(args.kind, model_name, threads=args.threads,
+                         batch_size=args.batch_size, seconds=args.seconds):
+        if "error" in row:
+            print(f"  {row['backend']:<10} failed: {row['error']}")
+            continue
+        print(f"  {row['backend']:<10} {row['items_per_second']:>9.1f}/s  "
+              f"{row['items_per_second_per_core']:>9.1f}/s/core  deviation {row['deviation']:.5f}"
+              f"{'' if row['within_tolerance'] else '  (OUT OF TOLERANCE)'}")
@@ -0,0 +1,155 @@
+"""
+Multi-agent fan-out queries
+Retrieves from several agents' indexes concurrently, fuses the chunks into one ranking and
+synthesizes a single answer. Similarity scores are only comparable between indexes built
+with the same embedding model, so they are min-max normalized per model before fusion.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Tuple
+
+from llama_index.core import QueryBundle, Settings
+from llama_index.core.schema import NodeWithScore
+
+from rag_synthesis import build_synthesizer
+
+logger = logging.getLogger(__name__)
+
+MAX_AGENTS = 10
+PER_AGENT_TOP_K = 5
+FUSED_TOP_K = 8
+RETRIEVAL_TIMEOUT_SECONDS = 20.0
+
+# Index build and retrieval per agent; shared by all fan-out queries
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="multi-agent")
+
+def _embed_model_of(index):
+    return getattr(index, "_embed_model", None) or Settings.embed_model
+
+def _model_key(embed_model) -> str:
+    return getattr(embed_model, "model_name", None) or type(embed_model).__name__
+
+def fuse_results(retrieved: Dict[str, List[NodeWithScore]], model_keys: Dict[str, str],
+                 top_k: int = FUSED_TOP_K) -> List[Dict[str, Any]]:
+    """Rank chunks from several agents together
+
+    Raw scores are min-max normalized over all chunks retrieved with the same embedding
+    model. Identical chunk texts (a file uploaded to two agents) are kept once at their best score.
+    """
+    pooled: Dict[str, List[float]] = {}
+    for agent_id, nodes in retrieved.items():
+        pooled.setdefault(model_keys[agent_id], []).extend(float(node.score or 0.0) for node in nodes)
+    bounds = {key: (min(scores), max(scores)) for key, scores in pooled.items() if scores}
+
+    best: Dict[str, Dict[str, Any]] = {}
+    for agent_id, nodes in retrieved.items():
+        low, high = bounds.get(model_keys[agent_id], (0.0, 0.0))
+        for rank, node in enumerate(nodes):
+            raw = float(node.score or 0.0)
+            normalized = (raw - low) / (high - low) if high > low else 1.0
+            text_key = hashlib.sha256(node.get_content().encode("utf-8")).hexdigest()
+            entry = best.get(text_key)
+            if entry is None or normalized > entry["score"]:
+                best[text_key] = {"agent_id": agent_id, "node": node, "score": normalized,
+                                  "raw_score": raw, "rank": rank}
+    # Ties (e.g. each model group's best chunk) go to the better per-agent rank
+    return sorted(best.values(), key=lambda entry: (-entry["score"], entry["rank"]))[:top_k]
+
+def multi_agent_query(question: str, agent_ids: List[str], resolve_index: Callable[[str], Any],
+                      query_config=None, per_agent_top_k: int = PER_AGENT_TOP_K,
+                      top_k: int = FUSED_TOP_K, timeout: float = RETRIEVAL_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """Answer a question from several agents' documents with one synthesis call
+
+    resolve_index(agent_id) returns the agent's index (or None). Agents whose index or
+    retrieval does not finish within timeout are left out and reported.
+    """
+    start = time.monotonic()
+    agent_ids = list(dict.fromkeys(agent_ids))[:MAX_AGENTS]
+    embeddings: Dict[str, Future] = {}
+    embeddings_lock = threading.Lock()
+
+    def query_embedding(embed_model) -> List[float]:
+        """Embed the question once per embedding model, however many agents use it"""
+        key = _model_key(embed_model)
+        with embeddings_lock:
+            future = embeddings.get(key)
+            owner = future is None
+            if owner:
+                future = embeddings[key] = Future()
+        if owner:
+            try:
+                future.set_result(embed_model.get_query_embedding(question))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def retrieve(agent_id: str) -> Tuple[List[NodeWithScore], str, float]:
+        agent_start = time.monotonic()
+        index = resolve_index(agent_id)
+        if index is None:
+            return [], "", 0.0
+        embed_model = _embed_model_of(index)
+        nodes = index.as_retriever(similarity_top_k=per_agent_top_k).retrieve(
+            QueryBundle(query_str=question, embedding=query_embedding(embed_model))
+        )
+        return nodes, _model_key(embed_model), (time.monotonic() - agent_start) * 1000
+
+    futures = {_executor.submit(retrieve, agent_id): agent_id for agent_id in agent_ids}
+    _, pending = wait(futures, timeout=timeout)
+
+    retrieved: Dict[str, List[NodeWithScore]] = {}
+    model_keys: Dict[str, str] = {}
+    agents: Dict[str, Dict[str, Any]] = {}
+    for future, agent_id in futures.items():
+        if future in pending:
+            future.cancel()
+            agents[agent_id] = {"status": "timeout"}
+            continue
+        try:
+            nodes, key, elapsed_ms = future.result()
+        except Exception as e:
+            logger.warning(f"Retrieval failed for agent {agent_id}: {e}")
+            agents[agent_id] = {"status": "error", "error": str(e)}
+            continue
+        if not key:
+            agents[agent_id] = {"status": "no_index"}
+            continue
+        retrieved[agent_id] = nodes
+        model_keys[agent_id] = key
+        agents[agent_id] = {"status": "ok", "retrieved": len(nodes), "elapsed_ms": round(elapsed_ms, 1)}
+    retrieval_ms = (time.monotonic() - start) * 1000
+
+    fused = fuse_results(retrieved, model_keys, top_k=top_k)
+    if not fused:
+        return {"query": question, "final_response": "No relevant documents found.", "sources": [],
+                "agents": agents, "retrieval_ms": round(retrieval_ms, 1), "synthesis_ms": 0.0}
+
+    # One LLM call over the fused chunks unless the request picked another synthesis mode
+    engine_kwargs = query_config.query_engine_kwargs() if query_config is not None else {}
+    synthesizer = engine_kwargs.get("response_synthesizer") or build_synthesizer("packed", llm=engine_kwargs.get("llm"))
+    synthesis_start = time.monotonic()
+    response = synthesizer.synthesize(
+        question, nodes=[NodeWithScore(node=entry["node"].node, score=entry["score"]) for entry in fused]
+    )
+    synthesis_ms = (time.monotonic() - synthesis_start) * 1000
+
+    return {
+        "query": question,
+        "final_response": str(response),
+        "sources": [
+            {
+                "agent_id": entry["agent_id"],
+                "node_id": entry["node"].node_id,
+                "file_name": (entry["node"].metadata or {}).get("file_name"),
+                "score": round(entry["score"], 4),
+                "raw_score": round(entry["raw_score"], 4),
+            }
+            for entry in fused
+        ],
+        "agents": agents,
+        "retrieval_ms": round(retrieval_ms, 1),
+        "synthesis_ms": round(synthesis_ms, 1),
+    }
@@ -0,0 +1,187 @@
+"""
+Per-request query configuration
+Generation and retrieval parameters for one query, taken from the request (as sent by the
+/api/chat route) over the agent's agent_settings. LLM clients are cached per distinct
+generation configuration so repeated settings reuse one client.
+"""
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Response synthesis modes (see rag_synthesis); "packed" is a single call over budget-packed chunks
+SYNTHESIS_MODES = ("compact", "refine", "tree_summarize", "packed")
+SYNTHESIS_MODE_ALIASES = {
+    "tree-summarize": "tree_summarize",
+    "single-call": "packed",
+    "single_call": "packed",
+}
+
+# Accepted ranges; values outside are clamped
+TEMPERATURE_RANGE = (0.0, 2.0)
+TOP_P_RANGE = (0.0, 1.0)
+PENALTY_RANGE = (-2.0, 2.0)
+MAX_TOKENS_RANGE = (1, 16384)
+SIMILARITY_TOP_K_RANGE = (1, 50)
+
+MAX_STOP_SEQUENCES = 4   # OpenAI limit
+
+# Distinct generation configurations whose LLM clients are kept (least recently used dropped)
+MAX_CACHED_LLMS = 32
+
+@dataclass(frozen=True)
+class QueryConfig:
+    """Per-query overrides; None leaves the global default in place"""
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    max_tokens: Optional[int] = None
+    frequency_penalty: Optional[float] = None
+    presence_penalty: Optional[float] = None
+    stop: Tuple[str, ...] = field(default_factory=tuple)
+    similarity_top_k: Optional[int] = None
+    response_mode: Optional[str] = None
+
+    @property
+    def has_generation_overrides(self) -> bool:
+        return any(value not in (None, ()) for value in self.generation_key())
+
+    def generation_key(self) -> Tuple[Any, ...]:
+        return (self.model, self.temperature, self.top_p, self.max_tokens,
+                self.frequency_penalty, self.presence_penalty, self.stop)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: (list(value) if isinstance(value, tuple) else value)
+                for key, value in asdict(self).items() if value not in (None, ())}
+
+    def query_engine_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for index.as_query_engine()"""
+        kwargs: Dict[str, Any] = {}
+        llm = get_llm(self) if self.has_generation_overrides else None
+        if self.response_mode is not None:
+            from rag_synthesis import build_synthesizer
+            kwargs["response_synthesizer"] = build_synthesizer(self.response_mode, llm=llm)
+        elif llm is not None:
+            kwargs["llm"] = llm
+        if self.similarity_top_k is not None:
+            kwargs["similarity_top_k"] = self.similarity_top_k
+        return kwargs
+
+def _number(value: Any, cast, bounds: Tuple[Any, Any], name: str):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError("not a finite number")
+        number = cast(number)
+    except (TypeError, ValueError, OverflowError):
+        logger.warning(f"Ignoring invalid {name}: {value!r}")
+        return None
+    return min(max(number, bounds[0]), bounds[1])
+
+def _stop_sequences(value: Any) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        # The chat settings form sends one comma- or newline-separated string
+        value = value.replace("\n", ",").split(",")
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    stops = (str(item).strip() for item in value if item is not None)
+    return tuple(stop for stop in stops if stop)[:MAX_STOP_SEQUENCES]
+
+def _openai_model(value: Any) -> Optional[str]:
+    """The requested model when LlamaIndex's OpenAI client supports it, else None (global LLM)"""
+    if not value:
+        return None
+    model = str(value).strip()
+    from llama_index.llms.openai.utils import ALL_AVAILABLE_MODELS
+    if model not in ALL_AVAILABLE_MODELS:
+        # The settings UI also offers models of other providers (claude-3-*, llama-2-70b)
+        logger.warning(f"Model {model!r} is not an OpenAI chat model, using the default LLM")
+        return None
+    return model
+
+def query_config(request: Dict[str, Any], agent_settings: Optional[Dict[str, Any]] = None) -> QueryConfig:
+    """Build the configuration for a query; request values override the agent's settings
+
+    Retrieval depth comes only from similarity_top_k; the chat form's top_k is a sampling
+    parameter (default 40) and is ignored. The synthesis mode comes from response_mode, or
+    the agent's synthesis_mode setting. Models the OpenAI client does not know are ignored.
+    """
+    settings = agent_settings or {}
+
+    def pick(*keys):
+        for source in (request, settings):
+            for key in keys:
+                value = source.get(key)
+                if value not in (None, ""):
+                    return value
+        return None
+
+    similarity_top_k = _number(pick("similarity_top_k"), int, SIMILARITY_TOP_K_RANGE, "similarity_top_k")
+
+    response_mode = pick("response_mode", "synthesis_mode")
+    if response_mode is not None:
+        response_mode = str(response_mode).strip().lower()
+        response_mode = SYNTHESIS_MODE_ALIASES.get(response_mode, response_mode)
+        if response_mode not in SYNTHESIS_MODES:
+            logger.warning(f"Ignoring unknown synthesis mode: {response_mode!r}")
+            response_mode = None
+
+    return QueryConfig(
+        model=_openai_model(pick("model")),
+        temperature=_number(pick("temperature"), float, TEMPERATURE_RANGE, "temperature"),
+        top_p=_number(pick("top_p"), float, TOP_P_RANGE, "top_p"),
+        max_tokens=_number(pick("max_tokens"), int, MAX_TOKENS_RANGE, "max_tokens"),
+        frequency_penalty=_number(pick("frequency_penalty"), float, PENALTY_RANGE, "frequency_penalty"),
+        presence_penalty=_number(pick("presence_penalty"), float, PENALTY_RANGE, "presence_penalty"),
+        stop=_stop_sequences(pick("stop_sequences", "stop")),
+        similarity_top_k=similarity_top_k,
+        response_mode=response_mode,
+    )
+
+_llms: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+_llms_lock = threading.Lock()
+
+def get_llm(config: QueryConfig):
+    """LlamaIndex OpenAI LLM for the configuration's generation parameters, created once per distinct set"""
+    key = config.generation_key()
+    with _llms_lock:
+        if key not in _llms:
+            from llama_index.core import Settings
+            from llama_index.llms.openai import OpenAI
+
+            base = Settings.llm
+            additional_kwargs: Dict[str, Any] = {}
+            if config.top_p is not None:
+                additional_kwargs["top_p"] = config.top_p
+            if config.frequency_penalty is not None:
+                additional_kwargs["frequency_penalty"] = config.frequency_penalty
+            if config.presence_penalty is not None:
+                additional_kwargs["presence_penalty"] = config.presence_penalty
+            if config.stop:
+                additional_kwargs["stop"] = list(config.stop)
+            _llms[key] = OpenAI(
+                model=config.model or getattr(base, "model", None) or "gpt-4o",
+                temperature=config.temperature if config.temperature is not None
+                else getattr(base, "temperature", 0.1),
+                max_tokens=config.max_tokens,
+                additional_kwargs=additional_kwargs,
+                api_key=os.getenv("OPENAI_API_KEY")
+            )
+            logger.info(f"Created LLM client for {config.to_dict()} ({len(_llms)} cached)")
+            while len(_llms) > MAX_CACHED_LLMS:
+                _llms.popitem(last=False)
+        _llms.move_to_end(key)
+        return _llms[key]
+
+def llm_cache_size() -> int:
+    with _llms_lock:
+        return len(_llms)
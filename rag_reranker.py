@@ -0,0 +1,166 @@
+"""
+Process-wide cross-encoder reranking service
+Each model is loaded once and shared. Concurrent requests are merged into micro-batches
+that a small thread pool scores, and (query, chunk ID) scores are cached.
+"""
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rag_cache import PersistentCache, normalize_query
+from rag_inference import load_cross_encoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+MAX_BATCH_SIZE = 64           # pairs per model call
+MAX_BATCH_WAIT_SECONDS = 0.005  # how long the first request in a batch waits for company
+SCORE_CACHE_TTL = 3600        # node IDs change on re-ingestion, so scores are not kept long
+
+class RerankerService:
+    """Shared cross-encoder that scores (query, chunk) pairs in cross-request micro-batches"""
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, workers: int = 2,
+                 intra_op_threads: Optional[int] = None, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait: float = MAX_BATCH_WAIT_SECONDS, cache_size: int = 20000):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        # Split the cores between the scoring threads instead of letting each one use all of them.
+        # Only ONNX sessions take this per model; PyTorch's thread count is process-wide and
+        # lowering it would also slow the embedding models, so it is left alone.
+        self.intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.cache = PersistentCache(max_entries=cache_size, default_ttl=SCORE_CACHE_TTL)
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._pending: "queue.Queue[Tuple[str, str, Future]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "pairs": 0, "cache_hits": 0, "batches": 0, "scored_pairs": 0}
+        self._dispatcher = threading.Thread(target=self._dispatch, name=f"reranker-{model_name}", daemon=True)
+        self._dispatcher.start()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        started = time.monotonic()
+        # PyTorch by default, ONNX/int8 when RAG_INFERENCE_BACKEND selects it
+        model = load_cross_encoder(self.model_name, threads=self.intra_op_threads)
+        logger.info(f"Loaded reranker {self.model_name} in {time.monotonic() - started:.1f}s "
+                    f"({self.workers} workers x {self.intra_op_threads} threads)")
+        return model
+
+    def warmup(self):
+        """Load the model ahead of the first query"""
+        self.model.predict([("warmup", "warmup")])
+
+    def _cache_key(self, query: str, chunk_id: str) -> str:
+        digest = hashlib.sha256(f"{self.model_name}\n{normalize_query(query)}".encode()).hexdigest()
+        return f"{digest}:{chunk_id}"
+
+    def score(self, query: str, chunks: Sequence[Tuple[str, str]],
+              timeout: Optional[float] = None) -> List[float]:
+        """Relevance scores for (chunk_id, text) pairs against the query, in input order"""
+        scores: List[Optional[float]] = [None] * len(chunks)
+        futures: Dict[int, Future] = {}
+        # One transaction each for reading and writing the request's scores
+        keys = [self._cache_key(query, chunk_id) for chunk_id, _ in chunks]
+        cached_scores = self.cache.get_many(keys)
+        for position, (_, text) in enumerate(chunks):
+            cached = cached_scores.get(keys[position])
+            if cached is not None:
+                scores[position] = cached
+                continue
+            future: Future = Future()
+            self._pending.put((query, text, future))
+            futures[position] = future
+
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["pairs"] += len(chunks)
+            self._stats["cache_hits"] += len(chunks) - len(futures)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fresh_scores: Dict[str, float] = {}
+        try:
+            for position, future in futures.items():
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                scores[position] = fresh_scores[keys[position]] = future.result(timeout=remaining)
+        except Exception:
+            # Pairs still queued are dropped from their batch
+            for future in futures.values():
+                future.cancel()
+            raise
+        finally:
+            self.cache.set_many(fresh_scores)
+        return scores
+
+    def _dispatch(self):
+        """Collect queued pairs into batches and hand them to the scoring pool"""
+        while True:
+            batch = [self._pending.get()]
+            flush_at = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._score_batch, batch)
+
+    def _score_batch(self, batch: List[Tuple[str, str, Future]]):
+        live = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            scores = self.model.predict([(query, text) for query, text, _ in live],
+                                        batch_size=len(live), show_progress_bar=False)
+        except Exception as e:
+            logger.error(f"Reranker batch of {len(live)} pairs failed: {e}")
+            for _, _, future in live:
+                future.set_exception(e)
+            return
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["scored_pairs"] += len(live)
+        for (_, _, future), score in zip(live, scores):
+            future.set_result(float(score))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["model"] = self.model_name
+        stats["loaded"] = self._model is not None
+        stats["cache_hit_rate"] = round(stats["cache_hits"] / stats["pairs"], 3) if stats["pairs"] else 0.0
+        stats["mean_batch_size"] = round(stats["scored_pairs"] / stats["batches"], 1) if stats["batches"] else 0.0
+        return stats
+
+_services: Dict[str, RerankerService] = {}
+_services_lock = threading.Lock()
+
+def get_reranker(model_name: str = DEFAULT_RERANKER_MODEL) -> RerankerService:
+    """The process-wide service for a model, created on first use"""
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = RerankerService(model_name)
+        return _services[model_name]
+
+def reranker_stats() -> List[Dict[str, Any]]:
+    with _services_lock:
+        services = list(_services.values())
+    return [service.stats() for service in services]
@@ -0,0 +1,100 @@
+"""
+Retrieve & Rerank RAG Implementation
+Initial broad retrieval followed by a cross-encoder reranking pass.
+Only the top-ranked chunks are passed to the LLM. Scoring goes through the shared
+reranker service, so the model is loaded once per process.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from llama_index.core import QueryBundle, get_response_synthesizer
+
+from rag_reranker import DEFAULT_RERANKER_MODEL, RerankerService, get_reranker
+
+logger = logging.getLogger(__name__)
+
+# Part of the deadline kept for synthesis, so a slow rerank still leaves time to answer
+SYNTHESIS_RESERVE_SECONDS = 5.0
+
+class RetrieveRerankRAG:
+    def __init__(self, index, reranker_model: str = DEFAULT_RERANKER_MODEL,
+                 initial_k: int = 20, final_k: int = 5, reranker: Optional[RerankerService] = None,
+                 router=None):
+        self.index = index
+        self.initial_k = initial_k
+        self.router = router  # Optional FileRouter narrowing the search to the most relevant files
+        self.retriever = index.as_retriever(similarity_top_k=initial_k)
+        self.reranker = reranker or get_reranker(reranker_model)
+        self.synthesizer = get_response_synthesizer()
+        self.final_k = final_k
+
+    def query(self, question: str, deadline: Optional[float] = None, query_config=None,
+              query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        logger.info(f"Running Retrieve & Rerank RAG query: {question}")
+        # Retrieve top-k candidates, from the routed files when the agent has a summary router
+        routed_files = None
+        if self.router is not None:
+            query_bundle, routed_files = self.router.route(question, query_embedding)
+            retriever = self.index.as_retriever(similarity_top_k=self.initial_k,
+                                                filters=self.router.filters(routed_files))
+            retrieved_nodes = retriever.retrieve(query_bundle)
+            if not retrieved_nodes:
+                routed_files = None
+                retrieved_nodes = self.retriever.retrieve(query_bundle)
+        else:
+            # A precomputed embedding (batch queries) skips the embedding call
+            retrieved_nodes = self.retriever.retrieve(
+                QueryBundle(query_str=question, embedding=query_embedding) if query_embedding is not None else question
+            )
+        if not retrieved_nodes:
+            logger.warning("No documents retrieved.")
+            return {"query": question, "final_response": "No relevant documents found.", "reranked": []}
+        # Score (chunk ID, text) pairs; repeated questions reuse cached scores
+        rerank_start = time.monotonic()
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic() - SYNTHESIS_RESERVE_SECONDS)
+        reranked_by_model = True
+        try:
+            scores = self.reranker.score(question, [(node.node_id, node.get_content()) for node in retrieved_nodes],
+                                         timeout=timeout)
+            # Sort by rerank score and keep only the best chunks for synthesis
+            reranked = sorted(zip(retrieved_nodes, scores), key=lambda x: x[1], reverse=True)
+        except Exception as e:
+            # Out of time or the model failed: answer from the retrieval order instead
+            logger.warning(f"Reranking skipped, using retrieval order: {e!r}")
+            reranked_by_model = False
+            reranked = [(node, node.score or 0.0) for node in retrieved_nodes]
+        rerank_ms = round((time.monotonic() - rerank_start) * 1000, 1)
+        # A per-request similarity_top_k sets how many reranked chunks reach the LLM
+        final_k = self.final_k
+        synthesizer = self.synthesizer
+        if query_config is not None:
+            final_k = query_config.similarity_top_k or final_k
+            engine_kwargs = query_config.query_engine_kwargs()
+            if "response_synthesizer" in engine_kwargs:
+                synthesizer = engine_kwargs["response_synthesizer"]
+            elif "llm" in engine_kwargs:
+                synthesizer = get_response_synthesizer(llm=engine_kwargs["llm"])
+        top_nodes = [node for node, _ in reranked[:final_k]]
+        logger.info(f"Best node score: {reranked[0][1]}")
+        response = synthesizer.synthesize(question, nodes=top_nodes)
+        return {
+            "query": question,
+            "final_response": str(response),
+            "source_nodes": len(top_nodes),
+            "reranked": [(node.node_id, float(score)) for node, score in reranked[:final_k]],
+            "candidates": len(retrieved_nodes),
+            "rerank_ms": rerank_ms,
+            "reranked_by_model": reranked_by_model,
+            "routed_files": routed_files
+        }
+
+def run_retrieve_rerank_query(query: str, index, reranker_model: str = DEFAULT_RERANKER_MODEL) -> Dict[str, Any]:
+    return RetrieveRerankRAG(index, reranker_model=reranker_model).query(query)
+
+if __name__ == "__main__":
+    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+
+    logging.basicConfig(level=logging.DEBUG)
+    index = VectorStoreIndex.from_documents(SimpleDirectoryReader('data').load_data())
+    result = run_retrieve_rerank_query("What is this project about?", index)
+    print(result["final_response"])
@@ -0,0 +1,501 @@
+"""
+Self-RAG Implementation
+A system that evaluates its own performance and can generate retrieval queries during generation.
+In "parallel" mode it instead generates several candidate answers concurrently and keeps the best.
+"""
+import os
+import math
+import time
+import logging
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional
+from dotenv import load_dotenv
+import openai
+from rag_context import ContextAssembler
+from rag_grounding import query_coverage, score_grounding
+
+load_dotenv()
+
+def _as_score(value: Any) -> Optional[float]:
+    """Numeric score from an LLM's JSON, or None for values like "8/10" or null"""
+    if isinstance(value, bool):
+        return None
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None
+    return score if math.isfinite(score) else None
+
+class SelfRAG:
+    def __init__(self, index, max_iterations: int = 3, similarity_top_k: int = 5,
+                 mode: str = "iterative", num_candidates: int = 3, context_token_budget: int = 2000):
+        self.logger = logging.getLogger(__name__)
+        self.max_iterations = max_iterations
+        self.mode = mode  # "iterative" (evaluate and refine) or "parallel" (best of N candidates)
+        self.num_candidates = num_candidates
+        self.context_token_budget = context_token_budget
+        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.retriever = index.as_retriever(similarity_top_k=similarity_top_k)
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 2 * num_candidates), thread_name_prefix="selfrag")
+    
+    def _local_evaluation(self, question: str, response: str, context: str) -> Optional[Dict[str, Any]]:
+        """Score clearly grounded or clearly ungrounded responses without the LLM judge"""
+        grounding = score_grounding(response, context.split("\n\n"))
+        coverage = query_coverage(question, response)
+        
+        if grounding.verdict == "grounded" and coverage >= 0.5:
+            accuracy, needs_improvement, suggestions = 5, False, []
+        elif grounding.verdict == "ungrounded":
+            accuracy, needs_improvement = 1, True
+            suggestions = ["Ground the answer in the retrieved context; most statements are not supported by it"]
+        else:
+            return None
+        
+        # Map lexical coverage onto the judge's 1-5 scale
+        relevance = 1 + round(4 * coverage)
+        completeness = 1 + round(4 * grounding.supported_fraction)
+        coherence = 4
+        return {
+            "relevance": relevance,
+            "accuracy": accuracy,
+            "completeness": completeness,
+            "coherence": coherence,
+            "overall": (relevance + accuracy + completeness + coherence) / 4,
+            "needs_improvement": needs_improvement,
+            "improvement_suggestions": suggestions,
+            "grounding_score": round(grounding.score, 3),
+            "method": "local"
+        }
+    
+    def _evaluate_response_quality(self, question: str, response: str, context: str) -> Dict[str, Any]:
+        """Evaluate the quality of a generated response"""
+        # The LLM judge only runs when the local grounding check is inconclusive
+        local_evaluation = self._local_evaluation(question, response, context)
+        if local_evaluation is not None:
+            self.logger.info(f"Response evaluated locally: overall {local_evaluation['overall']:.2f}")
+            return local_evaluation
+        
+        eval_prompt = f"""
+        Evaluate the quality of this response based on the given context.
+        
+        Question: {question}
+        Context: {context}
+        Response: {response}
+        
+        Rate the response on the following criteria (1-5 scale):
+        1. Relevance: How well does the response address the question?
+        2. Accuracy: How accurate is the information based on the context?
+        3. Completeness: How complete is the response?
+        4. Coherence: How well-structured and coherent is the response?
+        
+        Return your evaluation in JSON format:
+        {{
+            "relevance": score,
+            "accuracy": score,
+            "completeness": score,
+            "coherence": score,
+            "overall": average_score,
+            "needs_improvement": true/false,
+            "improvement_suggestions": ["suggestion1", "suggestion2"]
+        }}
+        """
+        
+        try:
+            response_eval = self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": eval_prompt}],
+                temperature=0.1
+            )
+            
+            evaluation = json.loads(response_eval.choices[0].message.content)
+            overall = _as_score(evaluation.get("overall"))
+            if overall is None:
+                # Average whatever criteria did parse; neutral when none did
+                criteria = [_as_score(evaluation.get(name))
+                            for name in ("relevance", "accuracy", "completeness", "coherence")]
+                criteria = [score for score in criteria if score is not None]
+                overall = sum(criteria) / len(criteria) if criteria else 3
+            evaluation["overall"] = overall
+            evaluation["method"] = "llm"
+            return evaluation
+            
+        except Exception as e:
+            self.logger.error(f"Error in response evaluation: {e}")
+            return {
+                "relevance": 3, "accuracy": 3, "completeness": 3, "coherence": 3,
+                "overall": 3, "needs_improvement": True,
+                "improvement_suggestions": ["Unable to evaluate - system error"]
+            }
+    
+    def _generate_follow_up_query(self, original_query: str, current_response: str, evaluation: Dict) -> str:
+        """Generate a follow-up retrieval query based on evaluation"""
+        if not evaluation.get("needs_improvement", False):
+            return None
+            
+        suggestions = evaluation.get("improvement_suggestions", [])
+        
+        follow_up_prompt = f"""
+        Based on the evaluation feedback, generate a more specific retrieval query to improve the response.
+        
+        Original Query: {original_query}
+        Current Response: {current_response}
+        Issues to Address: {', '.join(suggestions)}
+        
+        Generate a refined query that would retrieve more relevant information to address these issues.
+        Return only the refined query, nothing else.
+        """
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": follow_up_prompt}],
+                temperature=0.3
+            )
+            
+            return response.choices[0].message.content.strip()
+            
+        except Exception as e:
+            self.logger.error(f"Error generating follow-up query: {e}")
+            return None
+    
+    def _generate_response(self, query: str, context: str, iteration: int = 1) -> str:
+        """Generate response using the retrieved context"""
+        system_prompt = f"""
+        You are an AI assistant that provides accurate, helpful responses based on the given context.
+        
+        Instructions:
+        - Use only the information provided in the context
+        - If the context doesn't contain enough information, acknowledge this
+        - Be specific and detailed in your response
+        - This is iteration {iteration} of response generation
+        """
+        
+        user_prompt = f"""
+        Context: {context}
+        
+        Question: {query}
+        
+        Please provide a comprehensive answer based on the context above.
+        """
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.3
+            )
+            
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            return "I apologize, but I encountered an error while generating the response."
+    
+    def _generate_query_variants(self, question: str, count: int) -> List[str]:
+        """Generate alternative phrasings of the question for diverse retrieval"""
+        if count <= 0:
+            return []
+        
+        variants_prompt = f"""
+        Rewrite the following question in {count} different ways to retrieve diverse but relevant information.
+        Vary the wording and emphasis, but keep the meaning.
+        
+        Question: {question}
+        
+        Return the result in JSON format:
+        {{
+            "variants": ["variant 1", "variant 2"]
+        }}
+        """
+        
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": variants_prompt}],
+                temperature=0.7
+            )
+            
+            variants = json.loads(response.choices[0].message.content).get("variants", [])
+            return [variant.strip() for variant in variants if isinstance(variant, str) and variant.strip()][:count]
+            
+        except Exception as e:
+            self.logger.warning(f"Error generating query variants: {e}")
+            return []
+    
+    def _evaluate_candidates(self, question: str, candidates: List[str], context: str) -> List[Dict[str, Any]]:
+        """Score all candidate responses in a single evaluation call"""
+        candidate_text = "\n\n".join(
+            f"Candidate {number}:\n{candidate}" for number, candidate in enumerate(candidates, 1)
+        )
+        
+        eval_prompt = f"""
+        Evaluate each candidate response to the question based on the given context.
+        
+        Question: {question}
+        Context: {context}
+        
+        {candidate_text}
+        
+        Rate every candidate on the following criteria (1-5 scale):
+        1. Relevance: How well does the response address the question?
+        2. Accuracy: How accurate is the information based on the context?
+        3. Completeness: How complete is the response?
+        4. Coherence: How well-structured and coherent is the response?
+        
+        Return your evaluation in JSON format, one entry per candidate in order:
+        {{
+            "evaluations": [
+                {{
+                    "candidate": 1,
+                    "relevance": score,
+                    "accuracy": score,
+                    "completeness": score,
+                    "coherence": score,
+                    "overall": average_score
+                }}
+            ]
+        }}
+        """
+        
+        response_eval = self.openai_client.chat.completions.create(
+            model="gpt-4",
+            messages=[{"role": "user", "content": eval_prompt}],
+            temperature=0.1
+        )
+        
+        evaluations = json.loads(response_eval.choices[0].message.content).get("evaluations", [])
+        by_number = {}
+        for evaluation in evaluations if isinstance(evaluations, list) else []:
+            number = _as_score(evaluation.get("candidate")) if isinstance(evaluation, dict) else None
+            if number is not None:
+                by_number[int(number)] = evaluation
+        
+        # Candidates the judge skipped or scored unreadably keep their local score
+        local_scores = None
+        results = []
+        for number in range(1, len(candidates) + 1):
+            evaluation = by_number.get(number, {})
+            overall = _as_score(evaluation.get("overall"))
+            if overall is None:
+                if local_scores is None:
+                    local_scores = self._local_candidate_scores(question, candidates, context)
+                results.append(local_scores[number - 1])
+            else:
+                results.append(dict(evaluation, overall=overall, method="llm"))
+        return results
+    
+    def _local_candidate_scores(self, question: str, candidates: List[str], context: str) -> List[Dict[str, Any]]:
+        """Fallback ranking by local grounding and question coverage, on the judge's 1-5 scale"""
+        chunks = context.split(ContextAssembler.SEPARATOR)
+        scores = []
+        for candidate in candidates:
+            grounding = score_grounding(candidate, chunks)
+            coverage = query_coverage(question, candidate)
+            scores.append({"overall": 1 + 2 * grounding.score + 2 * coverage, "method": "local"})
+        return scores
+    
+    def _parallel_query(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Best-of-N Self-RAG: about three LLM round trips regardless of candidate count"""
+        self.logger.info(f"Starting parallel Self-RAG query with {self.num_candidates} candidates: {question}")
+        
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+        
+        # Round trip 1: query variants (the original question always retrieves too)
+        queries = [question] + self._generate_query_variants(question, self.num_candidates - 1)
+        
+        # Retrieve for all queries concurrently
+        retrieval_futures = [self._executor.submit(self.retriever.retrieve, query) for query in queries]
+        wait(retrieval_futures, timeout=remaining())
+        
+        shared_context = ContextAssembler(token_budget=self.context_token_budget)
+        candidate_contexts = []
+        for query, future in zip(queries, retrieval_futures):
+            if not future.done() or future.exception() is not None:
+                self.logger.warning(f"Retrieval for '{query}' failed or missed the deadline")
+                continue
+            nodes = future.result()
+            shared_context.add(nodes, source=query)
+            candidate_context = ContextAssembler(token_budget=self.context_token_budget)
+            candidate_context.add(nodes, source=query)
+            candidate_contexts.append((query, candidate_context.build()))
+        
+        # Round trip 2: one candidate answer per retrieved context, generated concurrently
+        generation_futures = [
+            self._executor.submit(self._generate_response, question, context, number)
+            for number, (_, context) in enumerate(candidate_contexts, 1)
+        ]
+        wait(generation_futures, timeout=remaining())
+        candidates = []
+        candidate_queries = []
+        for (query, _), future in zip(candidate_contexts, generation_futures):
+            if future.done() and future.exception() is None:
+                candidates.append(future.result())
+                candidate_queries.append(query)
+        
+        if not candidates:
+            return {
+                "original_query": question,
+                "mode": "parallel",
+                "final_response": "I apologize, but I could not generate a response in time.",
+                "candidates": [],
+                "total_iterations": 0,
+                "best_score": 0
+            }
+        
+        # Round trip 3: score every candidate in one call, ranking locally if it fails or runs late
+        context = shared_context.build()
+        evaluation_future = self._executor.submit(self._evaluate_candidates, question, candidates, context)
+        done, _ = wait([evaluation_future], timeout=remaining())
+        if done and evaluation_future.exception() is None:
+            evaluations = evaluation_future.result()
+        else:
+            self.logger.warning("Candidate evaluation failed or missed the deadline, ranking candidates locally")
+            evaluations = self._local_candidate_scores(question, candidates, context)
+        
+        best = max(range(len(candidates)), key=lambda i: evaluations[i]["overall"])
+        
+        return {
+            "original_query": question,
+            "mode": "parallel",
+            "final_response": candidates[best],
+            "candidates": [
+                {"query": query, "response": candidate, "evaluation": evaluation}
+                for query, candidate, evaluation in zip(candidate_queries, candidates, evaluations)
+            ],
+            "best_candidate": best + 1,
+            "total_iterations": 1,
+            "best_score": evaluations[best]["overall"]
+        }
+    
+    def query(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Main query method that implements self-evaluation and iterative improvement
+        
+        Args:
+            question: The user's question
+            deadline: Optional time.monotonic() value after which no further iterations start
+        """
+        if self.mode == "parallel":
+            return self._parallel_query(question, deadline)
+        
+        self.logger.info(f"Starting Self-RAG query: {question}")
+        
+        # Track the conversation history
+        conversation_history = {
+            "original_query": question,
+            "iterations": [],
+            "final_response": None,
+            "total_iterations": 0
+        }
+        
+        current_query = question
+        best_response = None
+        best_score = 0
+        
+        for iteration in range(1, self.max_iterations + 1):
+            if deadline is not None and time.monotonic() >= deadline and best_response is not None:
+                self.logger.info(f"Latency budget exhausted before Self-RAG iteration {iteration}")
+                break
+            
+            self.logger.info(f"Self-RAG Iteration {iteration}")
+            
+            # Retrieve relevant documents
+            retrieved_nodes = self.retriever.retrieve(current_query)
+            context = "\n\n".join([node.text for node in retrieved_nodes])
+            
+            # Generate response
+            response = self._generate_response(current_query, context, iteration)
+            
+            # Evaluate response quality
+            evaluation = self._evaluate_response_quality(question, response, context)
+            
+            # Track iteration
+            iteration_data = {
+                "iteration": iteration,
+                "query": current_query,
+                "response": response,
+                "context_length": len(context),
+                "evaluation": evaluation,
+                "retrieved_chunks": len(retrieved_nodes)
+            }
+            conversation_history["iterations"].append(iteration_data)
+            
+            # Check if this is the best response so far
+            current_score = evaluation.get("overall", 0)
+            if current_score > best_score:
+                best_score = current_score
+                best_response = response
+            
+            # If response is good enough, stop iterating
+            if not evaluation.get("needs_improvement", True) or current_score >= 4.0:
+                self.logger.info(f"Self-RAG converged after {iteration} iterations")
+                break
+            
+            # Generate follow-up query for next iteration
+            if iteration < self.max_iterations:
+                follow_up_query = self._generate_follow_up_query(question, response, evaluation)
+                if follow_up_query:
+                    current_query = follow_up_query
+                    self.logger.info(f"Generated follow-up query: {follow_up_query}")
+                else:
+                    self.logger.info("No follow-up query generated, stopping iteration")
+                    break
+        
+        conversation_history["final_response"] = best_response
+        conversation_history["total_iterations"] = len(conversation_history["iterations"])
+        conversation_history["best_score"] = best_score
+        
+        return conversation_history
+
+def run_self_rag_query(query: str, index, max_iterations: int = 3) -> Dict[str, Any]:
+    """
+    Run a Self-RAG query
+    
+    Args:
+        query: The user's question
+        index: Vector index holding the agent's documents
+        max_iterations: Maximum number of self-evaluation iterations
+    
+    Returns:
+        Dictionary containing the conversation history and final response
+    """
+    try:
+        self_rag = SelfRAG(index, max_iterations=max_iterations)
+        result = self_rag.query(query)
+        return result
+        
+    except Exception as e:
+        logging.error(f"Error in Self-RAG query: {e}")
+        return {
+            "error": str(e),
+            "final_response": "I apologize, but I encountered an error while processing your query."
+        }
+
+if __name__ == "__main__":
+    # Test the Self-RAG implementation
+    logging.basicConfig(level=logging.INFO)
+    
+    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+    
+    index = VectorStoreIndex.from_documents(SimpleDirectoryReader('data').load_data())
+    
+    test_query = "What are the main benefits of using artificial intelligence in business?"
+    result = run_self_rag_query(test_query, index)
+    
+    print("=== Self-RAG Results ===")
+    print(f"Original Query: {result['original_query']}")
+    print(f"Total Iterations: {result['total_iterations']}")
+    print(f"Best Score: {result.get('best_score', 'N/A')}")
+    print(f"\nFinal Response: {result['final_response']}")
+    
+    print("\n=== Iteration Details ===")
+    for iteration in result.get('iterations', []):
+        print(f"\nIteration {iteration['iteration']}:")
+        print(f"Query: {iteration['query']}")
+        print(f"Evaluation Score: {iteration['evaluation'].get('overall', 'N/A')}")
+        print(f"Needs Improvement: {iteration['evaluation'].get('needs_improvement', 'N/A')}")
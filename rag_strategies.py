@@ -0,0 +1,353 @@
+"""
+RAG Strategy Engine
+Dispatches agent queries to the RAG architecture configured for the agent (agents.rag_architecture).
+Every strategy runs over the shared per-agent index with a latency budget, a step limit and timing metrics.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHITECTURE = "baseline"
+
+# Per-agent persisted knowledge graphs (kept outside data/agents so they are not indexed)
+GRAPH_STORE_DIR = Path("data/graphs")
+
+# Process-wide caches shared by all agents (hypotheticals depend only on the question)
+CACHE_DIR = Path("data/cache")
+HYDE_SEMANTIC_THRESHOLD = 0.95
+
+_caches: Dict[str, Any] = {}
+_caches_lock = threading.Lock()
+
+def _shared_cache(name: str):
+    from rag_cache import PersistentCache
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = PersistentCache(CACHE_DIR / f"{name}.sqlite3")
+        return _caches[name]
+
+# Seconds a strategy may overrun its budget before the engine stops waiting for it
+BUDGET_GRACE_SECONDS = 2.0
+
+@dataclass(frozen=True)
+class StrategySpec:
+    """Static description of a RAG strategy and the limits it runs under"""
+    name: str
+    factory: Callable[..., Any]
+    latency_budget_s: float
+    max_steps: int = 1
+    expensive: bool = False
+    min_query_words: int = 0
+    accepts_deadline: bool = False
+    accepts_query_config: bool = False  # honours per-request generation/retrieval parameters
+    accepts_query_embedding: bool = False  # can retrieve with a precomputed query embedding
+
+class BaselineRAG:
+    """Plain LlamaIndex query engine over the agent index, optionally routed to the most relevant files"""
+
+    def __init__(self, index, router=None):
+        self.index = index
+        self.router = router
+        self.query_engine = index.as_query_engine()
+
+    def query(self, question: str, query_config=None, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        engine_kwargs = query_config.query_engine_kwargs() if query_config is not None else {}
+        query_engine = self.index.as_query_engine(**engine_kwargs) if engine_kwargs else self.query_engine
+        routed_files = None
+        if self.router is not None:
+            query_bundle, routed_files = self.router.route(question, query_embedding)
+            routed_engine = self.index.as_query_engine(filters=self.router.filters(routed_files), **engine_kwargs)
+            result = routed_engine.query(query_bundle)
+            if not getattr(result, "source_nodes", None):
+                # Summaries can miss a file; search everything rather than answer from nothing
+                routed_files = None
+                result = query_engine.query(query_bundle)
+        elif query_embedding is not None:
+            from llama_index.core import QueryBundle
+            result = query_engine.query(QueryBundle(query_str=question, embedding=query_embedding))
+        else:
+            result = query_engine.query(question)
+        source_nodes = getattr(result, "source_nodes", None) or []
+        return {
+            "query": question,
+            "final_response": str(result.response) if result and result.response else "",
+            "source_nodes": len(source_nodes),
+            "routed_files": routed_files
+        }
+
+# Factories import strategy modules lazily so that a missing optional dependency
+# (sentence-transformers) only disables the strategy that needs it.
+
+def _file_router(agent_id: str, index):
+    """Summary router built at ingestion for agents with many files, else None"""
+    from rag_file_router import SUMMARY_STORE_DIR, FileRouter
+    return FileRouter.load(str(SUMMARY_STORE_DIR / f"{agent_id}.json"), index)
+
+def _build_baseline(agent_id: str, index, documents, spec: StrategySpec):
+    return BaselineRAG(index, router=_file_router(agent_id, index))
+
+def _build_rerank(agent_id: str, index, documents, spec: StrategySpec):
+    from rag_retrieve_rerank import RetrieveRerankRAG
+    return RetrieveRerankRAG(index, router=_file_router(agent_id, index))
+
+def _build_graph(agent_id: str, index, documents, spec: StrategySpec):
+    # Returns at once; extraction and community summaries continue in the background
+    from rag_graph_rag import GraphRAG
+    return GraphRAG(index, documents, persist_dir=str(GRAPH_STORE_DIR / agent_id))
+
+def _build_hyde(agent_id: str, index, documents, spec: StrategySpec):
+    from rag_hyde_rag import HyDERAG
+    return HyDERAG(index, cache=_shared_cache("hyde"), semantic_threshold=HYDE_SEMANTIC_THRESHOLD)
+
+def _build_corrective(agent_id: str, index, documents, spec: StrategySpec):
+    from rag_corrective_rag import CorrectiveRAG
+    return CorrectiveRAG(index, max_corrections=spec.max_steps)
+
+def _build_self(agent_id: str, index, documents, spec: StrategySpec):
+    from rag_self_rag import SelfRAG
+    return SelfRAG(index, max_iterations=spec.max_steps)
+
+def _build_self_parallel(agent_id: str, index, documents, spec: StrategySpec):
+    from rag_self_rag import SelfRAG
+    return SelfRAG(index, mode="parallel")
+
+def _build_agentic(agent_id: str, index, documents, spec: StrategySpec):
+    from rag_agentic_rag import AgenticRAG
+    return AgenticRAG(index, max_steps=spec.max_steps, mode="tools")
+
+# Multi-call strategies (several LLM round trips per query) are marked expensive and
+# only run for queries long enough to justify the cost; short queries use baseline.
+STRATEGIES: Dict[str, StrategySpec] = {
+    "baseline": StrategySpec("baseline", _build_baseline, latency_budget_s=20.0, accepts_query_config=True,
+                             accepts_query_embedding=True),
+    "rerank": StrategySpec("rerank", _build_rerank, latency_budget_s=25.0, accepts_deadline=True,
+                           accepts_query_config=True, accepts_query_embedding=True),
+    "graph": StrategySpec("graph", _build_graph, latency_budget_s=30.0, accepts_deadline=True),
+    "hyde": StrategySpec("hyde", _build_hyde, latency_budget_s=45.0,
+                         expensive=True, min_query_words=4, accepts_deadline=True,
+                         accepts_query_embedding=True),
+    "crag": StrategySpec("crag", _build_corrective, latency_budget_s=60.0, max_steps=2,
+                         expensive=True, min_query_words=6, accepts_deadline=True),
+    "selfrag": StrategySpec("selfrag", _build_self, latency_budget_s=60.0, max_steps=2,
+                            expensive=True, min_query_words=6, accepts_deadline=True),
+    "selfrag-parallel": StrategySpec("selfrag-parallel", _build_self_parallel, latency_budget_s=40.0,
+                                     expensive=True, min_query_words=6, accepts_deadline=True),
+    "agentic": StrategySpec("agentic", _build_agentic, latency_budget_s=60.0, max_steps=4,
+                            expensive=True, min_query_words=6, accepts_deadline=True),
+}
+
+# Architecture keys used across the frontend (create-agent, admin rag-architectures, migration 005)
+ARCHITECTURE_ALIASES: Dict[str, str] = {
+    "llamaindex-pinecone": "baseline",
+    "baseline": "baseline",
+    "rerank": "rerank",
+    "retrieve-rerank": "rerank",
+    "graph": "graph",
+    "graph-rag": "graph",
+    "hybrid": "graph",
+    "hyde": "hyde",
+    "hyde-rag": "hyde",
+    "crag": "crag",
+    "corrective-rag": "crag",
+    "selfrag": "selfrag",
+    "self-rag": "selfrag",
+    "selfrag-parallel": "selfrag-parallel",
+    "self-rag-parallel": "selfrag-parallel",
+    "agentic": "agentic",
+    "agentic-rag": "agentic",
+}
+
+def resolve_architecture(rag_architecture: Optional[str]) -> str:
+    """Map an agent's rag_architecture value onto a registered strategy name"""
+    if not rag_architecture:
+        return DEFAULT_ARCHITECTURE
+    return ARCHITECTURE_ALIASES.get(rag_architecture.strip().lower(), DEFAULT_ARCHITECTURE)
+
+class StrategyMetrics:
+    """Thread-safe per-strategy call counters and latency samples"""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._window = window
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        if name not in self._stats:
+            self._stats[name] = {
+                "calls": 0, "errors": 0, "timeouts": 0, "downgrades": 0,
+                "total_ms": 0.0, "latencies": deque(maxlen=self._window)
+            }
+        return self._stats[name]
+
+    def record(self, name: str, elapsed_ms: float, error: bool = False, timeout: bool = False):
+        with self._lock:
+            entry = self._entry(name)
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["latencies"].append(elapsed_ms)
+            if error:
+                entry["errors"] += 1
+            if timeout:
+                entry["timeouts"] += 1
+
+    def record_downgrade(self, name: str):
+        with self._lock:
+            self._entry(name)["downgrades"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for name, entry in self._stats.items():
+                latencies = sorted(entry["latencies"])
+                result[name] = {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "timeouts": entry["timeouts"],
+                    "downgrades": entry["downgrades"],
+                    "avg_ms": round(entry["total_ms"] / entry["calls"], 1) if entry["calls"] else 0.0,
+                    "p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else 0.0,
+                    "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else 0.0
+                }
+            return result
+
+class StrategyEngine:
+    """Builds, caches and runs RAG strategies per agent"""
+
+    def __init__(self, max_workers: int = 8, baseline_workers: int = 8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-strategy")
+        # Baseline, which is also every strategy's fallback, has its own workers: strategies
+        # still running past their budget cannot be interrupted and would otherwise starve it
+        self._baseline_executor = ThreadPoolExecutor(max_workers=baseline_workers, thread_name_prefix="rag-baseline")
+        # Instances are stored as futures so concurrent first queries wait for one build
+        self._instances: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.metrics = StrategyMetrics()
+
+    def invalidate(self, agent_id: str):
+        """Drop cached strategy instances for an agent (call whenever its index is rebuilt)"""
+        with self._lock:
+            for key in [key for key in self._instances if key[0] == agent_id]:
+                del self._instances[key]
+
+    def instance_count(self) -> int:
+        with self._lock:
+            return len(self._instances)
+
+    def _get_instance(self, agent_id: str, spec: StrategySpec, index, documents: List[Any]):
+        """Cached strategy instance, built once per agent even when first queries arrive together"""
+        key = (agent_id, spec.name)
+        with self._lock:
+            future = self._instances.get(key)
+            owner = future is None
+            if owner:
+                future = self._instances[key] = Future()
+        if owner:
+            try:
+                future.set_result(spec.factory(agent_id, index, documents, spec))
+            except Exception as e:
+                # Failed builds are not cached; the next query tries again
+                with self._lock:
+                    if self._instances.get(key) is future:
+                        del self._instances[key]
+                future.set_exception(e)
+        return future.result()
+
+    def prepare(self, agent_id: str, rag_architecture: Optional[str], index, documents: Optional[List[Any]] = None):
+        """Build the agent's strategy ahead of its first query (called after ingestion)"""
+        spec = STRATEGIES[resolve_architecture(rag_architecture)]
+        try:
+            self._get_instance(agent_id, spec, index, documents or [])
+        except Exception as e:
+            logger.warning(f"Could not prepare strategy {spec.name} for agent {agent_id}: {e}")
+
+    def select(self, rag_architecture: Optional[str], query: str) -> Tuple[StrategySpec, Optional[str]]:
+        """Pick the strategy for a query, returning it with the reason for any downgrade"""
+        spec = STRATEGIES[resolve_architecture(rag_architecture)]
+        if spec.expensive and len(query.split()) < spec.min_query_words:
+            return STRATEGIES[DEFAULT_ARCHITECTURE], f"query too short for {spec.name}"
+        return spec, None
+
+    def run(self, agent_id: str, rag_architecture: Optional[str], query: str,
+            index, documents: Optional[List[Any]] = None, query_config=None,
+            query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Run the agent's strategy within its latency budget, falling back to baseline
+
+        query_config (a rag_query_config.QueryConfig) is applied by the strategies that
+        accept it; the multi-call strategies keep their own models and prompts. Likewise
+        query_embedding, a precomputed embedding of the query (batch requests).
+        """
+        requested = resolve_architecture(rag_architecture)
+        spec, downgrade_reason = self.select(rag_architecture, query)
+        if downgrade_reason:
+            self.metrics.record_downgrade(requested)
+
+        try:
+            instance = self._get_instance(agent_id, spec, index, documents or [])
+        except Exception as e:
+            if spec.name == DEFAULT_ARCHITECTURE:
+                raise
+            logger.warning(f"Strategy {spec.name} unavailable for agent {agent_id}: {e}")
+            self.metrics.record_downgrade(spec.name)
+            downgrade_reason = f"{spec.name} unavailable: {e}"
+            spec = STRATEGIES[DEFAULT_ARCHITECTURE]
+            instance = self._get_instance(agent_id, spec, index, documents or [])
+
+        start = time.monotonic()
+        deadline = start + spec.latency_budget_s
+        kwargs = {"deadline": deadline} if spec.accepts_deadline else {}
+        if spec.accepts_query_config and query_config is not None:
+            kwargs["query_config"] = query_config
+        if spec.accepts_query_embedding and query_embedding is not None:
+            kwargs["query_embedding"] = query_embedding
+        executor = self._baseline_executor if spec.name == DEFAULT_ARCHITECTURE else self._executor
+        future = executor.submit(instance.query, query, **kwargs)
+
+        try:
+            result = future.result(timeout=spec.latency_budget_s + BUDGET_GRACE_SECONDS)
+        except FutureTimeoutError:
+            elapsed_ms = (time.monotonic() - start) * 1000
+            self.metrics.record(spec.name, elapsed_ms, timeout=True)
+            if spec.name == DEFAULT_ARCHITECTURE:
+                raise TimeoutError(f"Baseline query exceeded {spec.latency_budget_s}s budget")
+            # The strategy thread cannot be interrupted; it finishes in the background
+            logger.warning(f"Strategy {spec.name} exceeded {spec.latency_budget_s}s budget for agent {agent_id}")
+            self.metrics.record_downgrade(spec.name)
+            fallback = self.run(agent_id, DEFAULT_ARCHITECTURE, query, index, documents, query_config,
+                                query_embedding)
+            fallback["requested_architecture"] = requested
+            fallback["downgrade_reason"] = f"{spec.name} exceeded latency budget"
+            return fallback
+        except Exception as e:
+            self.metrics.record(spec.name, (time.monotonic() - start) * 1000, error=True)
+            if spec.name == DEFAULT_ARCHITECTURE:
+                raise
+            # A failed strategy still gets a retrieval-backed answer rather than the basic-content mode
+            logger.warning(f"Strategy {spec.name} failed for agent {agent_id}, falling back to baseline: {e}")
+            self.metrics.record_downgrade(spec.name)
+            fallback = self.run(agent_id, DEFAULT_ARCHITECTURE, query, index, documents, query_config,
+                                query_embedding)
+            fallback["requested_architecture"] = requested
+            fallback["downgrade_reason"] = f"{spec.name} failed: {e}"
+            return fallback
+
+        elapsed_ms = (time.monotonic() - start) * 1000
+        self.metrics.record(spec.name, elapsed_ms, error="error" in result)
+
+        return {
+            "response": result.get("final_response") or "",
+            "architecture": spec.name,
+            "requested_architecture": requested,
+            "downgrade_reason": downgrade_reason,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "latency_budget_ms": spec.latency_budget_s * 1000,
+            "source_nodes": result.get("source_nodes", 0),
+            "query_config_applied": spec.accepts_query_config and query_config is not None,
+            "details": result
+        }
@@ -0,0 +1,154 @@
+"""
+Response synthesis modes
+LlamaIndex's compact, refine and tree_summarize synthesizers plus "packed": one LLM call over
+the retrieved chunks packed into a token budget in retrieval order. Agents choose a mode with
+the synthesis_mode setting.
+
+Benchmark: python rag_synthesis.py [--data DIR] [--questions FILE] [--top-k N]
+reports LLM calls, prompt tokens, latency and local grounding per mode over the same chunks.
+By default it runs on the fixed corpus and questions in benchmarks/synthesis.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core import PromptTemplate, get_response_synthesizer
+from llama_index.core.response_synthesizers import BaseSynthesizer
+
+from rag_context import count_tokens
+
+logger = logging.getLogger(__name__)
+
+PACKED_TOKEN_BUDGET = 3000
+
+PACKED_PROMPT = PromptTemplate(
+    "Context information is below.\n"
+    "---------------------\n"
+    "{context_str}\n"
+    "---------------------\n"
+    "Given the context information and not prior knowledge, answer the query.\n"
+    "Query: {query_str}\n"
+    "Answer: "
+)
+
+class PackedSynthesizer(BaseSynthesizer):
+    """Single-call synthesis: retrieved chunks are packed best-first into a token budget"""
+
+    def __init__(self, llm=None, token_budget: int = PACKED_TOKEN_BUDGET, **kwargs: Any):
+        super().__init__(llm=llm, **kwargs)
+        self._token_budget = token_budget
+        self._prompt = PACKED_PROMPT
+
+    def _get_prompts(self) -> Dict[str, Any]:
+        return {"text_qa_template": self._prompt}
+
+    def _update_prompts(self, prompts: Dict[str, Any]):
+        if "text_qa_template" in prompts:
+            self._prompt = prompts["text_qa_template"]
+
+    def _pack(self, text_chunks: Sequence[str]) -> str:
+        """Chunks in retrieval order (best first), skipping duplicates and any that no longer fit"""
+        packed: List[str] = []
+        seen = set()
+        used = 0
+        for chunk in text_chunks:
+            if chunk in seen:
+                continue
+            seen.add(chunk)
+            tokens = count_tokens(chunk)
+            if used + tokens > self._token_budget:
+                continue
+            packed.append(chunk)
+            used += tokens
+        return "\n\n".join(packed)
+
+    def get_response(self, query_str: str, text_chunks: Sequence[str], **response_kwargs: Any) -> str:
+        return self._llm.predict(self._prompt, context_str=self._pack(text_chunks), query_str=query_str)
+
+    async def aget_response(self, query_str: str, text_chunks: Sequence[str], **response_kwargs: Any) -> str:
+        return await self._llm.apredict(self._prompt, context_str=self._pack(text_chunks), query_str=query_str)
+
+def build_synthesizer(mode: str, llm=None, callback_manager=None) -> BaseSynthesizer:
+    """Synthesizer for a normalized mode name (see rag_query_config.SYNTHESIS_MODES)"""
+    if mode == "packed":
+        return PackedSynthesizer(llm=llm, callback_manager=callback_manager)
+    return get_response_synthesizer(llm=llm, response_mode=mode, callback_manager=callback_manager)
+
+BENCHMARK_DIR = Path(__file__).resolve().parent / "benchmarks" / "synthesis"
+BENCHMARK_CORPUS = BENCHMARK_DIR / "corpus"
+BENCHMARK_QUESTIONS = BENCHMARK_DIR / "questions.txt"
+
+def load_questions(path) -> List[str]:
+    """One question per line; blank lines and # comments are skipped"""
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+def benchmark_modes(index, questions: Sequence[str], modes: Sequence[str], similarity_top_k: int = 10,
+                    model: Optional[str] = None) -> List[Dict[str, Any]]:
+    """LLM calls, tokens, latency and grounding per mode; every mode sees the same retrieved chunks"""
+    if not questions:
+        raise ValueError("The benchmark needs at least one question")
+    import tiktoken
+    from llama_index.core.callbacks import CallbackManager, TokenCountingHandler
+    from llama_index.llms.openai import OpenAI
+
+    from rag_grounding import score_grounding
+
+    counter = TokenCountingHandler(tokenizer=tiktoken.get_encoding("cl100k_base").encode)
+    callback_manager = CallbackManager([counter])
+    llm = OpenAI(model=model or "gpt-3.5-turbo", temperature=0.0, callback_manager=callback_manager)
+
+    retriever = index.as_retriever(similarity_top_k=similarity_top_k)
+    retrieved = {question: retriever.retrieve(question) for question in questions}
+
+    results = []
+    for mode in modes:
+        synthesizer = build_synthesizer(mode, llm=llm, callback_manager=callback_manager)
+        latencies, groundings = [], []
+        counter.reset_counts()
+        for question in questions:
+            nodes = retrieved[question]
+            start = time.monotonic()
+            response = synthesizer.synthesize(question, nodes=nodes)
+            latencies.append((time.monotonic() - start) * 1000)
+            groundings.append(score_grounding(str(response), [node.get_content() for node in nodes]).score)
+        count = len(questions)
+        latencies.sort()
+        results.append({
+            "mode": mode,
+            "llm_calls_per_query": round(len(counter.llm_token_counts) / count, 2),
+            "prompt_tokens_per_query": round(counter.prompt_llm_token_count / count),
+            "completion_tokens_per_query": round(counter.completion_llm_token_count / count),
+            "avg_ms": round(sum(latencies) / count, 1),
+            "p50_ms": round(latencies[count // 2], 1),
+            "grounding": round(sum(groundings) / count, 3),
+        })
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
+
+    from rag_query_config import SYNTHESIS_MODES
+
+    parser = argparse.ArgumentParser(description="Benchmark response synthesis modes")
+    parser.add_argument("--data", default=str(BENCHMARK_CORPUS), help="Directory with the benchmark corpus")
+    parser.add_argument("--questions", default=str(BENCHMARK_QUESTIONS), help="File with one question per line")
+    parser.add_argument("--modes", nargs="+", default=list(SYNTHESIS_MODES))
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    questions = load_questions(args.questions)
+    if not questions:
+        parser.error(f"No questions in {args.questions}")
+    index = VectorStoreIndex.from_documents(SimpleDirectoryReader(args.data).load_data())
+
+    print(f"{len(questions)} questions, top-{args.top_k} chunks, corpus {args.data}")
+    print(f"{'mode':<16}{'calls/q':>9}{'prompt tok/q':>14}{'compl tok/q':>13}{'avg ms':>10}{'p50 ms':>10}{'grounding':>11}")
+    for row in benchmark_modes(index, questions, args.modes, similarity_top_k=args.top_k, model=args.model):
+        print(f"{row['mode']:<16}{row['llm_calls_per_query']:>9}{row['prompt_tokens_per_query']:>14}"
+              f"{row['completion_tokens_per_query']:>13}{row['avg_ms']:>10}{row['p50_ms']:>10}{row['grounding']:>11}")